@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, TextIO
+
+from importer.config import FILE_PROD_DOP, FILE_STOCK_PRICES, FILE_WAREHOUSES
+
+
+DEFAULT_LINES = 10_000
+DEFAULT_STOCKS_PER_PRODUCT = 5
+DEFAULT_ERROR_RATIO = 0.001
+DEFAULT_SEED = 1
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+BASE_DATE = datetime(2025, 1, 1)
+# Как в реальных выгрузках: сотни различных дат и ограниченный набор цен.
+DISTINCT_DATES = 365
+DISTINCT_PRICES = 5000
+
+
+def _product_id(n: int) -> str:
+    return f"{n:011d}"
+
+def _stock_id(n: int) -> str:
+    return f"{n:09d}"
+
+def _bool(rnd: random.Random, ratio: float = 0.5) -> str:
+    return "true" if rnd.random() < ratio else "false"
+
+def _datetime(rnd: random.Random) -> str:
+    return (BASE_DATE + timedelta(days=rnd.randrange(DISTINCT_DATES))).isoformat()
+
+def _price(rnd: random.Random) -> str:
+    return f"{rnd.randrange(DISTINCT_PRICES) * 9.9 + 99:.2f}"
+
+def _header(out: TextIO, delete: bool = False, reset: bool = False) -> None:
+    out.write('<?xml version="1.0" encoding="utf-8"?>\n<root>\n')
+    out.write(f'<info_update date="{datetime.now().replace(microsecond=0).isoformat()}"/>\n')
+    if delete:
+        out.write("<delete>true</delete>\n")
+    if reset:
+        out.write("<Reset>true</Reset>\n")
+    out.write("<lines>\n")
+
+def _footer(out: TextIO) -> None:
+    out.write("</lines>\n</root>\n")
+
+def _prod_dop_lines(rnd: random.Random, lines: int, error_ratio: float) -> Iterator[str]:
+    for n in range(lines):
+        if rnd.random() < error_ratio:
+            yield f'<line id_1c="{_product_id(n)}" it_ya="maybe"/>\n'
+            continue
+        yield f'<line id_1c="{_product_id(n)}" it_ya="{_bool(rnd, 0.3)}"/>\n'
+
+def _warehouses_lines(rnd: random.Random, lines: int, stocks: int, error_ratio: float) -> Iterator[str]:
+    for n in range(lines):
+        product_id = _product_id(n // stocks)
+        stock_id = _stock_id(n % stocks)
+        if rnd.random() < error_ratio:
+            yield f'<line product_id_1c="{product_id}" stock_id_1c="{stock_id}" price="n/a"/>\n'
+            continue
+        yield (
+            f'<line product_id_1c="{product_id}" stock_id_1c="{stock_id}" price="{_price(rnd)}" '
+            f'it_rrc="{_bool(rnd, 0.1)}" arch="{_bool(rnd, 0.05)}" edit_date="{_datetime(rnd)}" '
+            f'load_price_date="{_datetime(rnd)}" change_price_date="{_datetime(rnd)}"/>\n'
+        )
+
+def _stock_prices_lines(rnd: random.Random, lines: int, stocks: int, error_ratio: float) -> Iterator[str]:
+    for n in range(lines):
+        if rnd.random() < error_ratio:
+            yield f'<line product_id_1c="{_product_id(n)}"><price>{_price(rnd)}р.</price></line>\n'
+            continue
+        fanout = rnd.randint(0, stocks)
+        stock_ids = sorted(rnd.sample(range(stocks), fanout)) if fanout else []
+        stocks_data = [(stock_id, rnd.randint(0, 500)) for stock_id in stock_ids]
+        stocks_xml = "".join(
+            f'<stock stock_id_1c="{_stock_id(stock_id)}" Quantity="{quantity}"/>'
+            for stock_id, quantity in stocks_data
+        )
+        total_quantity = sum(quantity for _, quantity in stocks_data)
+        yield (
+            f'<line product_id_1c="{_product_id(n)}"><price>{_price(rnd)}</price>'
+            f"<total_quantity>{total_quantity}</total_quantity><stocks>{stocks_xml}</stocks></line>\n"
+        )
+
+def _write(path: Path, lines: Iterator[str], delete: bool = False, reset: bool = False) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as out:
+        _header(out, delete=delete, reset=reset)
+        out.writelines(lines)
+        _footer(out)
+    return path
+
+def generate_prod_dop(
+        out_dir: Path,
+        lines: int = DEFAULT_LINES,
+        error_ratio: float = DEFAULT_ERROR_RATIO,
+        seed: int = DEFAULT_SEED,
+        destructive: bool = False,
+    ) -> Path:
+    """
+    prod_dop.xml: lines строк, доля error_ratio с некорректным it_ya.
+    destructive - записать <delete>true</delete> (удаление отсутствующих строк при импорте).
+    """
+    rnd = random.Random(seed)
+    return _write(out_dir / FILE_PROD_DOP, _prod_dop_lines(rnd, lines, error_ratio), delete=destructive)
+
+def generate_warehouses(
+        out_dir: Path,
+        lines: int = DEFAULT_LINES,
+        stocks_per_product: int = DEFAULT_STOCKS_PER_PRODUCT,
+        error_ratio: float = DEFAULT_ERROR_RATIO,
+        seed: int = DEFAULT_SEED,
+        destructive: bool = False,
+    ) -> Path:
+    """
+    warehouses.xml: lines строк (товар x склад, stocks_per_product складов на товар),
+    доля error_ratio с некорректной ценой.
+    destructive - записать <delete>true</delete>.
+    """
+    rnd = random.Random(seed)
+    rows = _warehouses_lines(rnd, lines, stocks_per_product, error_ratio)
+    return _write(out_dir / FILE_WAREHOUSES, rows, delete=destructive)
+
+def generate_stock_prices(
+        out_dir: Path,
+        lines: int = DEFAULT_LINES,
+        stocks_per_product: int = DEFAULT_STOCKS_PER_PRODUCT,
+        error_ratio: float = DEFAULT_ERROR_RATIO,
+        seed: int = DEFAULT_SEED,
+        destructive: bool = False,
+    ) -> Path:
+    """
+    stock_prices.xml: lines товаров, у каждого от 0 до stocks_per_product складов,
+    доля error_ratio с некорректной ценой.
+    destructive - записать <Reset>true</Reset> (обнуление остатков отсутствующих товаров).
+    """
+    rnd = random.Random(seed)
+    rows = _stock_prices_lines(rnd, lines, stocks_per_product, error_ratio)
+    return _write(out_dir / FILE_STOCK_PRICES, rows, reset=destructive)
+
+def generate_all(
+        out_dir: Path,
+        lines: int = DEFAULT_LINES,
+        stocks_per_product: int = DEFAULT_STOCKS_PER_PRODUCT,
+        error_ratio: float = DEFAULT_ERROR_RATIO,
+        seed: int = DEFAULT_SEED,
+        destructive: bool = False,
+    ) -> dict[str, Path]:
+    """
+    Генерирует все три файла в out_dir. Возвращает пути по имени файла.
+    По умолчанию без <delete>/<Reset>: импорт файлов не удаляет и не обнуляет данные.
+    """
+    return {
+        FILE_PROD_DOP: generate_prod_dop(out_dir, lines, error_ratio, seed, destructive),
+        FILE_WAREHOUSES: generate_warehouses(out_dir, lines, stocks_per_product, error_ratio, seed, destructive),
+        FILE_STOCK_PRICES: generate_stock_prices(out_dir, lines, stocks_per_product, error_ratio, seed, destructive),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор синтетических XML-выгрузок 1С.")
+    parser.add_argument("--out", type=Path, required=True, help="Директория для файлов.")
+    parser.add_argument("--lines", type=int, default=DEFAULT_LINES, help="Число строк <line> в каждом файле.")
+    parser.add_argument("--stocks", type=int, default=DEFAULT_STOCKS_PER_PRODUCT, help="Складов на товар.")
+    parser.add_argument("--errors", type=float, default=DEFAULT_ERROR_RATIO, help="Доля строк с ошибками.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--destructive",
+        action="store_true",
+        help="Записать <delete>true</delete> и <Reset>true</Reset> (импорт удалит и обнулит отсутствующие данные).",
+    )
+    args = parser.parse_args()
+
+    files = generate_all(args.out, args.lines, args.stocks, args.errors, args.seed, args.destructive)
+    for path in files.values():
+        print(f"{path} ({path.stat().st_size / 1024 / 1024:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.generator import (
+    DEFAULT_ERROR_RATIO,
+    DEFAULT_LINES,
+    DEFAULT_SEED,
+    DEFAULT_STOCKS_PER_PRODUCT,
+    generate_all,
+)
+from importer.config import FILE_PROD_DOP, FILE_STOCK_PRICES, FILE_WAREHOUSES, app_db_config, bench_db_config
+from importer.db import ConnectionPool
+from importer.import_prod_dop import parse_prod_dop
+from importer.import_stock_prices import parse_stock_prices
+from importer.import_warehouses import parse_warehouses
+from importer.logger import logger
+from importer.main import IMPORTERS
+from importer.report import ImportReport
+from importer.timings import peak_rss_mb
+from importer.xml_utils import XmlReader, iter_lines, resolve_xml_backend
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DATA_DIR = BENCHMARKS_DIR / "data"
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+DEFAULT_TOLERANCE = 0.1
+DEFAULT_REPEAT = 3
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+PARSERS = {
+    FILE_PROD_DOP: parse_prod_dop,
+    FILE_WAREHOUSES: parse_warehouses,
+    FILE_STOCK_PRICES: parse_stock_prices,
+}
+
+
+def _db_target(host: str, port: int, database: str) -> tuple[str, int, str]:
+    host = host.lower()
+    return ("localhost" if host in LOCAL_HOSTS else host, port, database)
+
+def bench_db_error() -> str | None:
+    """
+    Причина, по которой сценарий sync запускать нельзя, или None.
+    sync пишет в БД, поэтому нужна отдельная тестовая база (BENCH_DB_*),
+    не совпадающая с рабочей базой приложения.
+    """
+    if bench_db_config is None:
+        return "не задана тестовая БД (BENCH_DB_NAME и BENCH_DB_* в .env)"
+    bench = _db_target(bench_db_config.host, bench_db_config.port, bench_db_config.database)
+    app = _db_target(app_db_config.host, app_db_config.port, app_db_config.database)
+    if bench == app:
+        return f"BENCH_DB_* указывает на рабочую БД приложения ({app_db_config.database})"
+    return None
+
+
+def _iter_lines(path: Path) -> int:
+    rows = 0
+    for elem in iter_lines(path):
+        rows += 1
+        elem.clear()
+    return rows
+
+def _parse(path: Path) -> int:
+    report = ImportReport(path.name)
+    return sum(1 for _ in PARSERS[path.name](XmlReader(path), report))
+
+def _sync(path: Path) -> int:
+    error = bench_db_error()
+    if error:
+        raise RuntimeError(f"Сценарий sync отключен: {error}")
+    report = ImportReport(path.name)
+    pool = ConnectionPool(bench_db_config)
+    try:
+        with pool.connection() as conn:
+            IMPORTERS[path.name](path, report, conn)
+    finally:
+        pool.close()
+    return report.products_parsed
+
+SCENARIOS: dict[str, Callable[[Path], int]] = {
+    "iter_lines": _iter_lines,
+    "parse": _parse,
+    "sync": _sync,
+}
+
+def _measure(scenario: str, path: Path) -> dict[str, Any]:
+    """
+    Выполняет сценарий в отдельном процессе: пиковая память процесса
+    относится только к этому сценарию.
+    """
+    logger.disable("importer")
+    started = time.perf_counter()
+    rows = SCENARIOS[scenario](path)
+    duration = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "duration_sec": round(duration, 4),
+        "rows_per_sec": round(rows / duration, 1) if duration else None,
+        "bytes_per_sec": round(path.stat().st_size / duration, 1) if duration else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_benchmarks(
+        files: dict[str, Path],
+        scenarios: list[str],
+        repeat: int = DEFAULT_REPEAT,
+    ) -> dict[str, dict[str, Any]]:
+    """
+    Прогоняет сценарии для каждого файла, ключ результата - "<сценарий>:<файл>".
+    Каждый прогон - в новом процессе; из repeat прогонов берется самый быстрый.
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for scenario in scenarios:
+        for file_name, path in files.items():
+            name = f"{scenario}:{file_name}"
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    runs.append(executor.submit(_measure, scenario, path).result())
+            results[name] = min(runs, key=lambda run: run["duration_sec"])
+            print(
+                f"{name:<32} {results[name]['rows']:>10} строк  "
+                f"{results[name]['rows_per_sec'] or 0:>12.1f} строк/с  "
+                f"{results[name]['peak_rss_mb']:>8.1f} МБ"
+            )
+    return results
+
+def compare(results: dict[str, dict[str, Any]], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    Сравнивает rows_per_sec и peak_rss_mb с базовой линией.
+    Возвращает список регрессий больше tolerance (доля).
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("rows_per_sec") or not current.get("rows_per_sec"):
+            continue
+        speed = current["rows_per_sec"] / base["rows_per_sec"] - 1
+        memory = current["peak_rss_mb"] / base["peak_rss_mb"] - 1 if base.get("peak_rss_mb") else 0.0
+        print(f"{name:<32} скорость {speed:+.1%}  память {memory:+.1%}")
+        if speed < -tolerance:
+            regressions.append(f"{name}: скорость {speed:+.1%}")
+        if memory > tolerance:
+            regressions.append(f"{name}: память {memory:+.1%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки импортера на синтетических выгрузках.")
+    parser.add_argument("--lines", type=int, default=DEFAULT_LINES, help="Число строк <line> в каждом файле.")
+    parser.add_argument("--stocks", type=int, default=DEFAULT_STOCKS_PER_PRODUCT, help="Складов на товар.")
+    parser.add_argument("--errors", type=float, default=DEFAULT_ERROR_RATIO, help="Доля строк с ошибками.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Сценарий (можно несколько). По умолчанию iter_lines и parse.",
+    )
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Директория сгенерированных файлов.")
+    parser.add_argument("--output", type=Path, help="Файл результатов (JSON).")
+    parser.add_argument("--baseline", type=Path, help="Базовая линия для сравнения (JSON).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Прогонов на сценарий (лучший).")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Допустимая регрессия (доля).")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or ["iter_lines", "parse"]
+    sync_error = bench_db_error() if "sync" in scenarios else None
+    if sync_error:
+        parser.error(f"сценарий sync: {sync_error}")
+    data_dir = args.data_dir / f"{args.lines}_{args.stocks}_{args.errors}_{args.seed}"
+    files = generate_all(data_dir, args.lines, args.stocks, args.errors, args.seed)
+
+    results = run_benchmarks(files, scenarios, max(1, args.repeat))
+    output = {
+        "created_at": datetime.now().astimezone().replace(microsecond=0).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "xml_parser": resolve_xml_backend(),
+        "params": {"lines": args.lines, "stocks": args.stocks, "errors": args.errors, "seed": args.seed},
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    output_path = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены: {output_path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != output["params"]:
+            print("Внимание: параметры генерации отличаются от базовой линии.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Регрессии:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
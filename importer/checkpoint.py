@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import os
+import gzip
+import json
+import shutil
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TextIO
+
+from importer.config import CHECKPOINT_SPOOL, SPOOL_DIR
+from importer.logger import logger
+from importer.parallel_parse import compact_row
+from importer.pipeline import iter_batches
+from importer.report import RowErrorCollector
+
+
+SPOOL_SUFFIX = ".spool"
+SPOOL_FORMAT_VERSION = 2
+SPOOL_BATCH_SIZE = 5000
+SPOOL_COMPRESS_LEVEL = 1
+
+
+class RowSpool:
+    """
+    Спул разобранных и проверенных строк файла: gzip-файл JSON-строк
+    (заголовок, пачки строк compact_row, итог с SHA-256 файла, параметрами
+    выгрузки и ошибками строк исходного разбора). Только данные: чтение
+    спула не исполняет код, в отличие от pickle.
+    Пишется во время импорта во временный файл и становится доступен
+    (os.replace) только после полного разбора, поэтому наличие файла
+    означает целостный спул. Повторный импорт из спула не разбирает XML.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.header: dict[str, Any] = {}
+        self.footer: dict[str, Any] = {}
+
+    @classmethod
+    def for_file(cls, file_path: Path) -> RowSpool:
+        """Спул текущего импорта файла (в SPOOL_DIR)."""
+        return cls(SPOOL_DIR / f"{file_path.name}{SPOOL_SUFFIX}")
+
+    @classmethod
+    def beside(cls, file_path: Path) -> RowSpool:
+        """Спул рядом с файлом (в FAILED_DIR)."""
+        return cls(file_path.with_name(f"{file_path.name}{SPOOL_SUFFIX}"))
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def record(
+            self,
+            rows: Iterable[Any],
+            source: Any,
+            row_errors: RowErrorCollector,
+            **header: Any,
+        ) -> Iterator[Any]:
+        """
+        Пропускает строки дальше, параллельно записывая их в спул.
+        source - читатель файла: после разбора берутся content_hash, bytes_read
+        и header (флаги delete/Reset могут стоять в конце файла); row_errors -
+        ошибки строк разбора, которые повторный импорт переносит в свой отчет.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.path.unlink(missing_ok=True)
+        completed = False
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=SPOOL_COMPRESS_LEVEL) as f:
+                _write_frame(f, {"version": SPOOL_FORMAT_VERSION, **header})
+                count = 0
+                for batch in iter_batches(rows, SPOOL_BATCH_SIZE):
+                    _write_frame(f, [compact_row(row) for row in batch])
+                    count += len(batch)
+                    yield from batch
+                footer = {
+                    "rows": count,
+                    "content_hash": source.content_hash,
+                    "bytes_read": source.bytes_read,
+                    "header": asdict(source.header),
+                    "row_errors": row_errors.to_dict(),
+                }
+                _write_frame(f, footer)
+            os.replace(tmp_path, self.path)
+            completed = True
+            logger.info(f"Спул строк сохранен: {self.path} (строк={count})")
+        finally:
+            if not completed:
+                tmp_path.unlink(missing_ok=True)
+
+    def read_header(self) -> dict[str, Any]:
+        """Читает заголовок спула (параметры выгрузки)."""
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            self.header = self._read_header(f)
+        return self.header
+
+    def _read_header(self, f: TextIO) -> dict[str, Any]:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("version") != SPOOL_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемый формат спула: {self.path}")
+        return header
+
+    def rows(self) -> Iterator[Any]:
+        """
+        Строки из спула. После полного прохода доступен footer (число строк,
+        SHA-256 и размер исходного файла, параметры выгрузки, ошибки строк).
+        """
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            self.header = self._read_header(f)
+            for line in f:
+                frame = json.loads(line)
+                if isinstance(frame, dict):
+                    self.footer = frame
+                    return
+                for row in frame:
+                    yield tuple(row)
+        raise ValueError(f"Спул без итогового кадра: {self.path}")
+
+    def move_beside(self, file_path: Path) -> None:
+        """Переносит спул к файлу (например, перемещенному в FAILED_DIR)."""
+        if not self.exists():
+            return
+        dest = RowSpool.beside(file_path)
+        try:
+            shutil.move(str(self.path), str(dest.path))
+            logger.warning(f"Спул строк перемещен: {dest.path}")
+        except OSError as e:
+            logger.error(f"Не удалось переместить спул '{self.path}': {e}")
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+def _write_frame(f: TextIO, frame: Any) -> None:
+    f.write(json.dumps(frame, ensure_ascii=False, separators=(",", ":")))
+    f.write("\n")
+
+def checkpoint_rows(
+        xml_path: Path,
+        rows: Iterable[Any],
+        source: Any,
+        row_errors: RowErrorCollector,
+        **header: Any,
+    ) -> Iterable[Any]:
+    """
+    При CHECKPOINT_SPOOL записывает строки импорта в спул файла,
+    иначе возвращает rows без изменений.
+    """
+    if not CHECKPOINT_SPOOL:
+        return rows
+    return RowSpool.for_file(xml_path).record(rows, source, row_errors, **header)
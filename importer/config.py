@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import dotenv_values
@@ -15,6 +16,7 @@ class DBConfig:
     password: str
     database: str
     autocommit: bool = False
+    local_infile: bool = False
 
 def _require(var_name: str) -> str:
     value = ENV_FILE.get(var_name)
@@ -22,6 +24,9 @@ def _require(var_name: str) -> str:
         raise ValueError(f"Отсутствует обязательная переменная окружения: {var_name}")
     return value
 
+def _optional(var_name: str, default: str) -> str:
+    return ENV_FILE.get(var_name) or default
+
 COMMON_DB_CONFIG = {
     "host": _require("DB_HOST"),
     "port": int(_require("DB_PORT")),
@@ -40,24 +45,107 @@ app_db_config = DBConfig(
     user=_require("DB_APP_USERNAME"),
     password=_require("DB_APP_PASSWORD"),
     autocommit=False,
+    local_infile=True,
 )
 
 DB_APP_ALLOWED_HOST = _require("DB_APP_ALLOWED_HOST")
 
+# Отдельная тестовая БД для сценария sync бенчмарков (benchmarks.run).
+# Без BENCH_DB_NAME сценарий недоступен; хост и порт по умолчанию - как у DB_*.
+BENCH_DB_NAME = _optional("BENCH_DB_NAME", "")
+bench_db_config = DBConfig(
+    host=_optional("BENCH_DB_HOST", COMMON_DB_CONFIG["host"]),
+    port=int(_optional("BENCH_DB_PORT", str(COMMON_DB_CONFIG["port"]))),
+    user=_optional("BENCH_DB_USERNAME", ""),
+    password=_optional("BENCH_DB_PASSWORD", ""),
+    database=BENCH_DB_NAME,
+    autocommit=False,
+    local_infile=True,
+) if BENCH_DB_NAME else None
+
+# sql_mode сессий импортера: по умолчанию не меняется (режим сервера). Если задан,
+# флаги добавляются к текущему @@SESSION.sql_mode, а не заменяют его.
+DB_SESSION_SQL_MODE = _optional("DB_SESSION_SQL_MODE", "")
+
 TEST_DIR = BASE_DIR / "test_dir"
 IMPORT_DIR = _require("IMPORT_DIR")
+# Число файлов разных типов, импортируемых одновременно (и размер пула соединений).
+IMPORT_CONCURRENCY = max(1, int(_optional("IMPORT_CONCURRENCY", "3")))
+# Резидентный режим (importer.daemon): файл считается загруженным, если его размер
+# и mtime не менялись WATCH_SETTLE_SEC секунд (или сразу после IN_CLOSE_WRITE);
+# полная проверка директории выполняется раз в WATCH_RESCAN_SEC секунд.
+WATCH_SETTLE_SEC = float(_optional("WATCH_SETTLE_SEC", "5"))
+WATCH_RESCAN_SEC = float(_optional("WATCH_RESCAN_SEC", "60"))
+# Парсер XML: auto (lxml, если установлен), lxml или etree (стандартная библиотека).
+XML_PARSER = _optional("XML_PARSER", "auto")
+# Параллельный разбор больших warehouses.xml и prod_dop.xml по диапазонам байт:
+# число процессов (0 или 1 - выключено), минимальный размер файла и размер диапазона.
+PARALLEL_PARSE_WORKERS = int(_optional("PARALLEL_PARSE_WORKERS", "0"))
+PARALLEL_PARSE_MIN_BYTES = int(_optional("PARALLEL_PARSE_MIN_MB", "64")) * 1024 * 1024
+PARALLEL_PARSE_CHUNK_BYTES = int(_optional("PARALLEL_PARSE_CHUNK_MB", "4")) * 1024 * 1024
+# Синхронизация stock_prices: atomic - все изменения одной транзакцией (по умолчанию),
+# online - диапазонами по STOCK_PRICES_CHUNK_PRODUCTS товаров (по product_id_1c),
+# каждый в короткой транзакции, с паузой STOCK_PRICES_CHUNK_PAUSE_MS между ними.
+SYNC_MODE_ATOMIC = "atomic"
+SYNC_MODE_ONLINE = "online"
+STOCK_PRICES_SYNC_MODE = _optional("STOCK_PRICES_SYNC_MODE", SYNC_MODE_ATOMIC)
+STOCK_PRICES_CHUNK_PRODUCTS = max(1, int(_optional("STOCK_PRICES_CHUNK_PRODUCTS", "1000")))
+STOCK_PRICES_CHUNK_PAUSE_SEC = int(_optional("STOCK_PRICES_CHUNK_PAUSE_MS", "100")) / 1000
+# Очистка shop_product_stocks_log (importer.purge_logs): записи старше
+# STOCKS_LOG_RETENTION_DAYS удаляются пачками по STOCKS_LOG_PURGE_BATCH строк
+# с паузой STOCKS_LOG_PURGE_PAUSE_MS. Резидентный режим запускает очистку раз
+# в STOCKS_LOG_PURGE_INTERVAL_SEC (0 - выключено) не дольше STOCKS_LOG_PURGE_MAX_SEC.
+STOCKS_LOG_RETENTION_DAYS = int(_optional("STOCKS_LOG_RETENTION_DAYS", "365"))
+STOCKS_LOG_PURGE_BATCH = max(1, int(_optional("STOCKS_LOG_PURGE_BATCH", "5000")))
+STOCKS_LOG_PURGE_PAUSE_SEC = int(_optional("STOCKS_LOG_PURGE_PAUSE_MS", "200")) / 1000
+STOCKS_LOG_PURGE_INTERVAL_SEC = float(_optional("STOCKS_LOG_PURGE_INTERVAL_SEC", "3600"))
+STOCKS_LOG_PURGE_MAX_SEC = float(_optional("STOCKS_LOG_PURGE_MAX_SEC", "60"))
 SQL_DIR = Path(__file__).resolve().parent / "sql"
 
 REPORT_DIR = BASE_DIR / "reports"
 FAILED_DIR = REPORT_DIR / "failed"
 UNKNOWN_DIR = REPORT_DIR / "unknown"
+SNAPSHOT_DIR = REPORT_DIR / "snapshots"
 LOG_DIR = BASE_DIR / "log"
 
 FILE_PROD_DOP = "prod_dop.xml"
 FILE_WAREHOUSES = "warehouses.xml"
 FILE_STOCK_PRICES = "stock_prices.xml"
 REPORT_FILE_NAME = "report.json"
+MANIFEST_FILE_NAME = "manifest.json"
 LOG_FILE_NAME = "xml_importer.log"
+MANIFEST_FILE = REPORT_DIR / MANIFEST_FILE_NAME
+REPORT_STORE_FILE = REPORT_DIR / "reports.sqlite3"
+
+# История отчетов хранится в REPORT_STORE_FILE REPORT_HISTORY_DAYS дней.
+# report.json для nginx - сводка за REPORT_SUMMARY_HOURS часов, в которой
+# у каждого отчета не больше REPORT_SUMMARY_ROW_ERRORS ошибок строк.
+REPORT_HISTORY_DAYS = int(_optional("REPORT_HISTORY_DAYS", "30"))
+REPORT_SUMMARY_HOURS = int(_optional("REPORT_SUMMARY_HOURS", "24"))
+REPORT_SUMMARY_ROW_ERRORS = int(_optional("REPORT_SUMMARY_ROW_ERRORS", "100"))
+# Ошибки строк группируются по типу и полю: в отчете общее число, группы
+# с ROW_ERRORS_GROUP_LINES номерами первых строк и выборка первых
+# ROW_ERRORS_SAMPLE ошибок. В лог пишутся первые ROW_ERRORS_LOG_FIRST ошибок,
+# дальше - не чаще раза в ROW_ERRORS_LOG_INTERVAL_SEC. При ROW_ERRORS_SPILL=true
+# полный список сохраняется в ROW_ERRORS_DIR (JSONL, хранится REPORT_HISTORY_DAYS).
+ROW_ERRORS_SAMPLE = int(_optional("ROW_ERRORS_SAMPLE", "100"))
+ROW_ERRORS_GROUP_LINES = int(_optional("ROW_ERRORS_GROUP_LINES", "10"))
+ROW_ERRORS_LOG_FIRST = int(_optional("ROW_ERRORS_LOG_FIRST", "20"))
+ROW_ERRORS_LOG_INTERVAL_SEC = float(_optional("ROW_ERRORS_LOG_INTERVAL_SEC", "10"))
+ROW_ERRORS_SPILL = _optional("ROW_ERRORS_SPILL", "false").lower() in ("1", "true", "yes")
+ROW_ERRORS_DIR = REPORT_DIR / "row_errors"
+# Метрики Prometheus: после каждого запуска в METRICS_TEXTFILE_DIR пишется
+# xml_importer.prom для textfile collector node_exporter (не задан - выключено).
+# Счетчики и гистограммы между запусками хранятся в METRICS_STATE_FILE.
+_metrics_textfile_dir = _optional("METRICS_TEXTFILE_DIR", "")
+METRICS_TEXTFILE_DIR = Path(_metrics_textfile_dir) if _metrics_textfile_dir else None
+METRICS_STATE_FILE = REPORT_DIR / "metrics_state.json"
+# Контрольные точки импорта warehouses.xml и prod_dop.xml: при CHECKPOINT_SPOOL=true
+# разобранные строки пишутся в спул (SPOOL_DIR), который при ошибке синхронизации
+# переносится в FAILED_DIR рядом с файлом. importer.reprocess_failed повторяет
+# импорт из спула без разбора XML.
+CHECKPOINT_SPOOL = _optional("CHECKPOINT_SPOOL", "false").lower() in ("1", "true", "yes")
+SPOOL_DIR = REPORT_DIR / "spool"
 
 TABLE_PROD_DROP="tbl_prod_dop"
 TABLE_WAREHOUSES="warehouses"
@@ -70,23 +158,49 @@ STOCK_PRICES_TABLES = [
     "shop_product_stocks_log",
 ]
 
+# Способ загрузки временных таблиц (ключ "load_mode" в SQL_CONFIG):
+# LOAD_MODE_INFILE - LOAD DATA LOCAL INFILE с откатом на executemany,
+# если local infile запрещен на сервере.
+LOAD_MODE_EXECUTEMANY = "executemany"
+LOAD_MODE_INFILE = "infile"
+
+# Режим дельты (ключ "delta_mode" в SQL_CONFIG): после успешной синхронизации
+# сохраняется локальный снимок ключ -> хэш строки, следующий импорт отправляет
+# в БД только новые, измененные и удаленные ключи. Ключ строки - первые
+# колонки columns_list, перечисленные в key_columns.
+DELTA_SNAPSHOT_MAX_AGE = timedelta(hours=24)
+
+# Лог движения остатков (ключ "log_stocks" для stock_prices): перед upsert остатков
+# одним INSERT ... SELECT по временной таблице в shop_product_stocks_log пишутся
+# изменившиеся остатки (было, стало, разница).
+
 SQL_CONFIG = {
     TABLE_PROD_DROP: {
         "tmp_table": "prod_dop/tmp_table.sql",
         "insert": "prod_dop/insert.sql",
         "update": "prod_dop/update.sql",
         "delete": "prod_dop/delete_missing.sql",
+        "tmp_deleted": "prod_dop/tmp_deleted.sql",
+        "delete_keys": "prod_dop/delete_keys.sql",
         "target_table": TABLE_PROD_DROP,
         "columns_list": "id_1c, it_ya",
+        "key_columns": "id_1c",
+        "load_mode": LOAD_MODE_EXECUTEMANY,
+        "delta_mode": False,
     },
     TABLE_WAREHOUSES: {
         "tmp_table": "warehouses/tmp_table.sql",
         "insert": "warehouses/insert.sql",
         "update": "warehouses/update.sql",
         "delete": "warehouses/delete_missing.sql",
+        "tmp_deleted": "warehouses/tmp_deleted.sql",
+        "delete_keys": "warehouses/delete_keys.sql",
         "target_table": TABLE_WAREHOUSES,
         "columns_list":
             "product_id_1c, stock_id_1c, edit_date, price, it_rrc, change_price_date, load_price_date, arch",
+        "key_columns": "product_id_1c, stock_id_1c",
+        "load_mode": LOAD_MODE_INFILE,
+        "delta_mode": False,
     },
     TABLE_STOCK_PRICES: {
         "tmp_products": "stock_prices/tmp_products.sql",
@@ -95,12 +209,30 @@ SQL_CONFIG = {
         "insert_tmp_stocks": "stock_prices/insert_tmp_stocks.sql",
         "update_products": "stock_prices/update_shop_product.sql",
         "update_skus": "stock_prices/update_shop_product_skus.sql",
+        "count_products": "stock_prices/count_matched_products.sql",
+        "count_skus": "stock_prices/count_matched_skus.sql",
+        "insert_stocks_log": "stock_prices/insert_stocks_log.sql",
         "upsert_stocks": "stock_prices/upsert_shop_product_stocks.sql",
         "delete_missing_stocks_per_product": "stock_prices/delete_missing_stocks_per_product.sql",
         "reset_products": "stock_prices/reset_missing_products.sql",
         "reset_skus": "stock_prices/reset_missing_skus.sql",
         "delete_stocks_for_missing_products": "stock_prices/delete_stocks_for_missing_products.sql",
-        "clean_logs": "stock_prices/clean_logs.sql",
+        "purge_logs_bounds": "stock_prices/purge_logs_bounds.sql",
+        "purge_logs_batch_end": "stock_prices/purge_logs_batch_end.sql",
+        "purge_logs_delete": "stock_prices/purge_logs_delete.sql",
+        "online_chunk_end": "stock_prices/online_chunk_end.sql",
+        "online_fill_products": "stock_prices/online_fill_products.sql",
+        "online_fill_stocks": "stock_prices/online_fill_stocks.sql",
+        "online_reset_chunk_end": "stock_prices/online_reset_chunk_end.sql",
+        "online_reset_products": "stock_prices/online_reset_products.sql",
+        "online_reset_skus": "stock_prices/online_reset_skus.sql",
+        "online_delete_stocks_for_missing_products": "stock_prices/online_delete_stocks_for_missing_products.sql",
+        "tmp_products_table": "tmp_stock_prices_products",
+        "tmp_products_columns": "product_id_1c, price, total_quantity",
+        "tmp_stocks_table": "tmp_stock_prices_stocks",
+        "tmp_stocks_columns": "product_id_1c, stock_id_1c, quantity",
+        "load_mode": LOAD_MODE_INFILE,
+        "log_stocks": False,
     },
 }
 
@@ -117,5 +249,5 @@ DATE_FORMAT_LOG = "%Y%m%d_%H%M%S"
 
 XML_ENCODING = "utf-8"
 
-for directory in [REPORT_DIR, FAILED_DIR, UNKNOWN_DIR, LOG_DIR]:
+for directory in [REPORT_DIR, FAILED_DIR, UNKNOWN_DIR, SNAPSHOT_DIR, LOG_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
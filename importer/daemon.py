@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import os
+import time
+import ctypes
+import select
+import signal
+import struct
+import ctypes.util
+from contextlib import suppress
+from pathlib import Path
+
+from importer.config import (
+    IMPORT_CONCURRENCY,
+    IMPORT_DIR,
+    STOCKS_LOG_PURGE_INTERVAL_SEC,
+    STOCKS_LOG_PURGE_MAX_SEC,
+    WATCH_RESCAN_SEC,
+    WATCH_SETTLE_SEC,
+)
+from importer.db import ConnectionPool
+from importer.logger import logger
+from importer.main import process_files
+from importer.purge_logs import run_purge
+from importer.xml_utils import get_xml_files, is_xml_file
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+class InotifyWatcher:
+    """
+    Наблюдение за директорией через inotify (Linux, через ctypes без внешних
+    зависимостей). Сообщает имена файлов, запись которых завершена
+    (IN_CLOSE_WRITE) или которые перемещены в директорию (IN_MOVED_TO).
+    """
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc не найдена")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify не поддерживается")
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch: {directory}")
+        self.overflowed = False
+
+    def read_events(self) -> set[str]:
+        """
+        Читает накопленные события без блокировки, возвращает имена файлов.
+        При переполнении очереди событий выставляет overflowed.
+        """
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    self.overflowed = True
+                elif length:
+                    names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+                offset += length
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class UploadTracker:
+    """
+    Отслеживает файлы во входящей директории и определяет завершенность
+    загрузки: файл готов, если после события закрытия на запись его размер
+    и mtime не менялись, либо если они стабильны WATCH_SETTLE_SEC секунд.
+    """
+    def __init__(self, settle_sec: float = WATCH_SETTLE_SEC):
+        self.settle_sec = settle_sec
+        self._pending: dict[Path, tuple[tuple[int, int], float, bool]] = {}
+
+    def observe(self, path: Path, closed: bool = False) -> None:
+        """Регистрирует файл (closed=True - получено событие закрытия)."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._pending.pop(path, None)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        previous = self._pending.get(path)
+        if previous is not None and previous[0] == signature:
+            self._pending[path] = (signature, previous[1], previous[2] or closed)
+        else:
+            self._pending[path] = (signature, time.monotonic(), closed)
+
+    def pop_ready(self) -> list[Path]:
+        """Возвращает и забывает файлы, загрузка которых завершена."""
+        ready = []
+        now = time.monotonic()
+        for path, (signature, since, closed) in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != signature:
+                self._pending[path] = (current, now, False)
+            elif closed or now - since >= self.settle_sec:
+                del self._pending[path]
+                ready.append(path)
+        return sorted(ready)
+
+    def __bool__(self) -> bool:
+        return bool(self._pending)
+
+class ImportDaemon:
+    """
+    Резидентный обработчик: следит за IMPORT_DIR и импортирует готовые
+    XML-файлы сразу после завершения загрузки, используя постоянный
+    пул соединений с БД. Раз в STOCKS_LOG_PURGE_INTERVAL_SEC, когда нет
+    ожидающих файлов, очищает shop_product_stocks_log.
+    """
+    def __init__(self, import_dir: Path):
+        self.import_dir = import_dir
+        self.tracker = UploadTracker()
+        self.pool = ConnectionPool(size=IMPORT_CONCURRENCY)
+        self._stopping = False
+
+    def stop(self, signum=None, frame=None) -> None:
+        logger.info("Получен сигнал остановки, завершение после текущего импорта.")
+        self._stopping = True
+
+    def _rescan(self) -> None:
+        for file_path in get_xml_files(self.import_dir):
+            self.tracker.observe(file_path)
+
+    def _import_ready(self) -> None:
+        ready = self.tracker.pop_ready()
+        if not ready:
+            return
+        if not self.pool.check():
+            logger.critical("Нет связи с БД. Импорт отложен до следующей проверки.")
+            for file_path in ready:
+                self.tracker.observe(file_path)
+            return
+        logger.info(f"Файлы готовы к импорту: {', '.join(path.name for path in ready)}")
+        process_files(ready, self.pool)
+
+    def _wait(self, watcher: InotifyWatcher | None, wake_fd: int, timeout: float) -> None:
+        """
+        Ждет событий inotify, сигнала (wake_fd) или истечения timeout.
+        """
+        fds = [wake_fd] if watcher is None else [watcher.fd, wake_fd]
+        try:
+            readable, _, _ = select.select(fds, [], [], timeout)
+        except InterruptedError:
+            return
+        if wake_fd in readable:
+            with suppress(BlockingIOError):
+                os.read(wake_fd, _READ_SIZE)
+        if watcher is not None and watcher.fd in readable:
+            for name in watcher.read_events():
+                if is_xml_file(name):
+                    self.tracker.observe(self.import_dir / name, closed=True)
+
+    def run(self, wake_fd: int) -> None:
+        """
+        Главный цикл. wake_fd - конец канала, в который пишется при сигнале
+        (signal.set_wakeup_fd), чтобы остановка не ждала таймаута.
+        """
+        logger.info(f"Запуск резидентного обработчика XML-файлов. Директория: {self.import_dir}")
+        try:
+            watcher = InotifyWatcher(self.import_dir)
+        except OSError as e:
+            watcher = None
+            logger.warning(f"inotify недоступен ({e}), опрос директории каждые {WATCH_SETTLE_SEC} с.")
+
+        last_rescan = float("-inf")
+        last_purge = float("-inf")
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                if watcher is None or watcher.overflowed or now - last_rescan >= WATCH_RESCAN_SEC:
+                    if watcher is not None:
+                        watcher.overflowed = False
+                    self._rescan()
+                    last_rescan = now
+
+                self._import_ready()
+                if self._stopping:
+                    break
+
+                if STOCKS_LOG_PURGE_INTERVAL_SEC > 0 and not self.tracker \
+                        and time.monotonic() - last_purge >= STOCKS_LOG_PURGE_INTERVAL_SEC:
+                    run_purge(self.pool, max_duration_sec=STOCKS_LOG_PURGE_MAX_SEC)
+                    last_purge = time.monotonic()
+                    continue
+
+                timeout = WATCH_SETTLE_SEC if self.tracker or watcher is None else WATCH_RESCAN_SEC
+                self._wait(watcher, wake_fd, timeout)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            self.pool.close()
+            logger.info("Резидентный обработчик остановлен.")
+
+def main():
+    """
+    Точка входа резидентного обработчика (systemd Type=simple).
+    """
+    daemon = ImportDaemon(Path(IMPORT_DIR))
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    try:
+        daemon.run(wake_r)
+    finally:
+        signal.set_wakeup_fd(-1)
+        os.close(wake_r)
+        os.close(wake_w)
+
+
+if __name__ == "__main__":
+    main()
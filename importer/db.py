@@ -1,8 +1,12 @@
+import queue
+import threading
+from contextlib import contextmanager
 from dataclasses import asdict
+from typing import Iterator
 
 import mariadb
 
-from importer.config import DBConfig, app_db_config
+from importer.config import DB_SESSION_SQL_MODE, DBConfig, app_db_config
 from importer.logger import logger
 
 
@@ -29,13 +33,103 @@ def close_db(conn) -> None:
     except mariadb.Error as e:
         logger.error(f"Ошибка при закрытии соединения с базой данных: {e}")
 
-def check_db_connection() -> bool:
+def init_session(conn) -> None:
     """
-    Проверяет доступность базы данных (использует дефолтный конфиг).
+    Применяет настройки сессии один раз после открытия соединения:
+    добавляет флаги DB_SESSION_SQL_MODE (если заданы) к sql_mode сервера.
     """
+    if not DB_SESSION_SQL_MODE:
+        return
+    cursor = conn.cursor()
     try:
-        conn = connect_db()
-        close_db(conn)
-        return True
-    except Exception:
-        return False
+        cursor.execute(
+            "SET SESSION sql_mode = CONCAT_WS(',', NULLIF(@@SESSION.sql_mode, ''), %s)",
+            (DB_SESSION_SQL_MODE,),
+        )
+    finally:
+        cursor.close()
+
+@contextmanager
+def relaxed_checks(cursor) -> Iterator[None]:
+    """
+    Отключает unique_checks/foreign_key_checks на время загрузки временных таблиц.
+    Проверки включаются сразу после загрузки, а не отключаются на всю сессию:
+    следующие шаги синхронизации пишут в рабочие таблицы, и для них проверки
+    внешних ключей и уникальности должны работать. Цена - два SET на файл.
+    """
+    cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+    try:
+        yield
+    finally:
+        try:
+            cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+        except mariadb.Error as e:
+            logger.error(f"Не удалось восстановить проверки сессии: {e}")
+
+class ConnectionPool:
+    """
+    Небольшой пул соединений на время работы импортера.
+    Соединения открываются лениво (не более size), настройки сессии
+    применяются один раз при открытии, перед выдачей соединение
+    проверяется ping() и при обрыве переоткрывается.
+    """
+    def __init__(self, config: DBConfig = app_db_config, size: int = 1):
+        self.config = config
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        conn = connect_db(config=self.config)
+        try:
+            init_session(conn)
+        except mariadb.Error:
+            close_db(conn)
+            raise
+        return conn
+
+    def _checkout(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            try:
+                conn.ping()
+                return conn
+            except mariadb.Error as e:
+                logger.warning(f"Соединение с БД потеряно ({e}), переподключение.")
+                close_db(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """
+        Выдает соединение из пула и возвращает его после использования.
+        """
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def check(self) -> bool:
+        """
+        Проверяет доступность базы данных (ping соединения из пула).
+        """
+        try:
+            with self.connection():
+                return True
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        """Закрывает все свободные соединения пула."""
+        while True:
+            try:
+                close_db(self._idle.get_nowait())
+            except queue.Empty:
+                return
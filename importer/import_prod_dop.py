@@ -1,78 +1,112 @@
 from pathlib import Path
+from typing import Iterator
+from xml.etree.ElementTree import Element
 
 from typing_extensions import TypeAlias
 
+from importer.checkpoint import checkpoint_rows
 from importer.config import FILE_PROD_DOP, SQL_CONFIG, TABLE_PROD_DROP
 from importer.logger import logger
+from importer.parallel_parse import ChunkedXmlParser, use_parallel_parse
 from importer.report import ImportReport
 from importer.sync import sync_data
-from importer.xml_utils import iter_lines, parse_bool, read_delete_flag
+from importer.xml_utils import (
+    FIRST_LINE_NUMBER,
+    ROW_ERROR_MISSING,
+    RowParseError,
+    ValueConverters,
+    XmlReader,
+    describe_row_error,
+)
 
 
 ProdDopRow: TypeAlias = tuple[str, int]
 
 
-def _parse_prod_dop(xml_path: Path, report: ImportReport) -> list[ProdDopRow]:
+def _parse_prod_dop_line(line: Element, i: int, converters: ValueConverters) -> ProdDopRow:
+    """
+    Разбирает один элемент <line> prod_dop.xml (i - номер строки для сообщений).
+    Ошибки данных - RowParseError; значения преобразуются через converters.
+    """
+    id_1c = line.attrib.get("id_1c")
+    if not id_1c:
+        raise RowParseError(f"Отсутствует id_1c в строке #{i}.", "id_1c", ROW_ERROR_MISSING)
+
+    it_ya = converters.parse_bool(
+        line.attrib.get("it_ya"),
+        i,
+        "it_ya",
+    )
+
+    return (id_1c, it_ya)
+
+def parse_prod_dop(reader: XmlReader, report: ImportReport) -> Iterator[ProdDopRow]:
     """
     Парсит prod_dop.xml.
     Ожидается <line> с атрибутами id_1c и it_ya.
+    Генератор: строки отдаются по мере чтения файла.
     """
-    rows: list[ProdDopRow] = []
-
-    for i, line in enumerate(iter_lines(xml_path), start=6):
+    converters = ValueConverters()
+    for i, line in enumerate(reader.lines(), start=FIRST_LINE_NUMBER):
 
         try:
-            id_1c = line.attrib.get("id_1c")
-            if not id_1c:
-                raise ValueError(f"Отсутствует id_1c в строке #{i}.")
-
-            it_ya = parse_bool(
-                line.attrib.get("it_ya"),
-                i,
-                "it_ya",
-            )
+            yield _parse_prod_dop_line(line, i, converters)
 
-            rows.append((id_1c, it_ya))
-
-        except ValueError as e:
-            report.add_row_error(i, str(e))
-            continue
         except Exception as e:
-            report.add_row_error(i, f"Неизвестная ошибка парсинга: {e}")
+            report.add_row_error(i, *describe_row_error(e))
             continue
 
-    return rows
+    report.add_converter_cache_stats(converters.cache_stats())
 
 
-def import_prod_dop(xml_path: Path, report: ImportReport) -> None:
+def import_prod_dop(xml_path: Path, report: ImportReport, conn) -> None:
     """
     Импорт данных из prod_dop.xml.
     """
     logger.info(f"Импорт файла '{FILE_PROD_DOP}': {xml_path}")
 
-    is_delete = read_delete_flag(xml_path)
-    logger.info(f"Параметры импорта: delete={is_delete}")
+    reader = XmlReader(xml_path)
+    if reader.header.info_update_date:
+        report.set_info_update_date(reader.header.info_update_date)
+
+    if use_parallel_parse(xml_path):
+        reader.close()
+        source = ChunkedXmlParser(xml_path, _parse_prod_dop_line)
+        logger.info(f"Параллельный разбор файла: процессов={source.workers}")
+        rows = source.rows(report)
+    else:
+        source = reader
+        rows = parse_prod_dop(reader, report)
+
+    rows = checkpoint_rows(
+        xml_path,
+        rows,
+        source,
+        report.row_errors,
+        file=FILE_PROD_DOP,
+    )
 
-    rows = _parse_prod_dop(xml_path, report)
+    sync_results = sync_data(
+        conn,
+        rows=report.timings.measure_iter("parse", rows),
+        is_delete=lambda: source.header.is_delete,
+        timings=report.timings,
+        cfg=SQL_CONFIG[TABLE_PROD_DROP],
+    )
 
-    report.set_products_parsed(len(rows))
+    report.set_products_parsed(sync_results["rows_parsed"])
+    report.set_content_hash(source.content_hash)
+    report.timings.record("parse", bytes_count=source.bytes_read)
 
-    if not rows:
+    if not sync_results["rows_parsed"]:
         logger.warning(f"В файле {xml_path.name} нет валидных строк для импорта.")
         return
 
-    logger.info(f"Подготовлено строк к загрузке: count={len(rows)}")
-
-    sync_results = sync_data(
-        rows=rows,
-        is_delete=is_delete,
-        cfg=SQL_CONFIG[TABLE_PROD_DROP],
-    )
-
     report.set_metrics({
         "db_inserted": sync_results["db_inserted"],
         "db_updated": sync_results["db_updated"],
-        "db_deleted": sync_results["db_deleted"]
+        "db_deleted": sync_results["db_deleted"],
+        "rows_unchanged": sync_results["rows_unchanged"],
     })
 
     logger.success(f"Импорт '{FILE_PROD_DOP}' завершён.")
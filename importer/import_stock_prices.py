@@ -1,53 +1,77 @@
-from dataclasses import dataclass
-from decimal import Decimal
+import sys
+from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import List, Tuple
-
-from importer.config import FILE_STOCK_PRICES
+from typing import Iterator, List, NamedTuple, Tuple
+
+from importer.config import (
+    FILE_STOCK_PRICES,
+    SQL_CONFIG,
+    STOCK_PRICES_SYNC_MODE,
+    SYNC_MODE_ONLINE,
+    TABLE_STOCK_PRICES,
+)
 from importer.logger import logger
 from importer.report import ImportReport
 from importer.sync import sync_stock_prices
-from importer.xml_utils import iter_lines, read_reset_flag
+from importer.xml_utils import (
+    FIRST_LINE_NUMBER,
+    ROW_ERROR_MISSING,
+    RowParseError,
+    ValueConverters,
+    XmlReader,
+    describe_row_error,
+)
+
+
+ZERO = Decimal("0")
 
 
-@dataclass
-class ProductRow:
+class ProductRow(NamedTuple):
+    """Строка tmp_stock_prices_products: порядок полей совпадает с колонками."""
     product_id_1c: str
     price: Decimal
     total_quantity: Decimal
 
-@dataclass
-class StockItem:
+class StockItem(NamedTuple):
+    """Строка tmp_stock_prices_stocks: порядок полей совпадает с колонками."""
     product_id_1c: str
     stock_id_1c: str
     quantity: Decimal
 
-def _parse_stock_prices(xml_path: Path, report: ImportReport) -> Tuple[List[ProductRow], List[StockItem]]:
+def _decimal_text(converters: ValueConverters, text: str, i: int, field_name: str) -> Decimal:
+    try:
+        return converters.decimal(text)
+    except InvalidOperation as e:
+        raise RowParseError(f"Некорректное значение '{field_name}' в строке #{i}: '{text}'.", field_name) from e
+
+def parse_stock_prices(reader: XmlReader, report: ImportReport) -> Iterator[Tuple[ProductRow, List[StockItem]]]:
     """
     Парсит stock_prices.xml.
+    Генератор: для каждой валидной строки отдает товар и его склады.
     """
-    products_data: List[ProductRow] = []
-    stocks_data: List[StockItem] = []
-
-    for i, elem in enumerate(iter_lines(xml_path), start=6):
+    converters = ValueConverters()
+    for i, elem in enumerate(reader.lines(), start=FIRST_LINE_NUMBER):
         if elem.tag != "line":
             continue
 
         try:
             product_id_1c = elem.get("product_id_1c")
             if not product_id_1c:
-                elem.clear()
-                raise ValueError(f"Отсутствует обязательный атрибут 'product_id_1c' в строке #{i}.")
-
+                raise RowParseError(
+                    f"Отсутствует обязательный атрибут 'product_id_1c' в строке #{i}.",
+                    "product_id_1c",
+                    ROW_ERROR_MISSING,
+                )
 
             price_elem = elem.find("price")
-            price = Decimal(
-                price_elem.text) if (price_elem is not None and price_elem.text) else Decimal("0")
+            price = _decimal_text(converters, price_elem.text, i, "price") \
+                if (price_elem is not None and price_elem.text) else ZERO
 
             total_qty_elem = elem.find("total_quantity")
-            total_qty = Decimal(
-                total_qty_elem.text) if (total_qty_elem is not None and total_qty_elem.text) else Decimal("0")
+            total_qty = _decimal_text(converters, total_qty_elem.text, i, "total_quantity") \
+                if (total_qty_elem is not None and total_qty_elem.text) else ZERO
 
+            stocks_data: List[StockItem] = []
             stocks_elem = elem.find("stocks")
 
             if stocks_elem is not None:
@@ -56,66 +80,66 @@ def _parse_stock_prices(xml_path: Path, report: ImportReport) -> Tuple[List[Prod
                     qty_val = stock.get("Quantity")
 
                     if stock_id_1c and qty_val:
-                        try:
-                            stocks_data.append(StockItem(
-                                product_id_1c=product_id_1c,
-                                stock_id_1c=stock_id_1c,
-                                quantity=Decimal(qty_val)
-                            ))
-                        except ValueError as e:
-                            raise ValueError(f"Ошибка данных склада {stock_id_1c} в строке #{i}") from e
-
-            products_data.append(ProductRow(
-                product_id_1c=product_id_1c,
-                price=price,
-                total_quantity=total_qty
-            ))
-
-        except ValueError as e:
-            report.add_row_error(i, str(e))
-            continue
+                        stocks_data.append(StockItem(
+                            product_id_1c,
+                            sys.intern(stock_id_1c),
+                            _decimal_text(converters, qty_val, i, "Quantity"),
+                        ))
+
+            product = ProductRow(product_id_1c, price, total_qty)
+
         except Exception as e:
-            report.add_row_error(i, f"Неизвестная ошибка парсинга: {e}")
+            report.add_row_error(i, *describe_row_error(e))
+            continue
         finally:
             elem.clear()
 
-    return products_data, stocks_data
+        yield product, stocks_data
+
+    report.add_converter_cache_stats(converters.cache_stats())
 
 
-def import_stock_prices(xml_path: Path, report: ImportReport) -> None:
+def import_stock_prices(xml_path: Path, report: ImportReport, conn) -> None:
     """
     Основная точка входа для импорта stock_prices.xml.
     """
     logger.info(f"Начат импорт файла '{FILE_STOCK_PRICES}': {xml_path}")
 
     try:
-        is_reset = read_reset_flag(xml_path)
-        logger.info(f"Параметры импорта: reset={is_reset}")
+        reader = XmlReader(xml_path)
+        if reader.header.info_update_date:
+            report.set_info_update_date(reader.header.info_update_date)
+
+        sync_results = sync_stock_prices(
+            conn,
+            lines=report.timings.measure_iter("parse", parse_stock_prices(reader, report)),
+            is_reset=lambda: reader.header.is_reset,
+            timings=report.timings,
+        )
 
-        products_rows, stocks_rows = _parse_stock_prices(xml_path, report)
+        report.set_products_parsed(sync_results["products_staged"])
+        report.set_content_hash(reader.content_hash)
+        report.timings.record("parse", bytes_count=reader.bytes_read)
 
-        if not products_rows:
+        if not sync_results["products_staged"]:
             logger.warning(f"В файле {xml_path.name} нет валидных данных для импорта.")
             return
 
-        report.set_products_parsed(len(products_rows))
-
-        logger.info(f"Подготовлено к загрузке: товаров={len(products_rows)}, записей складов={len(stocks_rows)}")
-
-        sync_results = sync_stock_prices(
-            products_data=products_rows,
-            stocks_data=stocks_rows,
-            is_reset=is_reset
-        )
-
-        report.set_metrics({
+        metrics = {
             "products_updated": sync_results["products_updated"],
+            "products_unchanged": sync_results["products_unchanged"],
             "skus_updated": sync_results["skus_updated"],
+            "skus_unchanged": sync_results["skus_unchanged"],
             "stocks_upserted": sync_results["stocks_upserted"],
             "products_reset": sync_results["products_reset"],
             "skus_reset": sync_results["skus_reset"],
             "stocks_deleted": sync_results["stocks_deleted"]
-        })
+        }
+        if STOCK_PRICES_SYNC_MODE == SYNC_MODE_ONLINE:
+            metrics["chunks_committed"] = sync_results["chunks_committed"]
+        if SQL_CONFIG[TABLE_STOCK_PRICES].get("log_stocks"):
+            metrics["stocks_logged"] = sync_results["stocks_logged"]
+        report.set_metrics(metrics)
 
         report.set_success()
         logger.success(f"Импорт '{FILE_STOCK_PRICES}' успешно завершён.")
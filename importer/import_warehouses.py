@@ -1,19 +1,25 @@
+import sys
 from datetime import date
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+from xml.etree.ElementTree import Element
 
 from typing_extensions import TypeAlias
 
+from importer.checkpoint import checkpoint_rows
 from importer.config import FILE_WAREHOUSES, SQL_CONFIG, TABLE_WAREHOUSES
 from importer.logger import logger
+from importer.parallel_parse import ChunkedXmlParser, use_parallel_parse
 from importer.report import ImportReport
 from importer.sync import sync_data
 from importer.xml_utils import (
-    iter_lines,
-    parse_bool,
-    parse_datetime_to_date,
-    read_delete_flag,
+    FIRST_LINE_NUMBER,
+    ROW_ERROR_MISSING,
+    RowParseError,
+    ValueConverters,
+    XmlReader,
+    describe_row_error,
 )
 
 
@@ -29,114 +35,138 @@ WarehouseRow: TypeAlias = tuple[
 ]
 
 
-def _parse_warehouses(xml_path: Path, report: ImportReport) -> list[WarehouseRow]:
+def _parse_warehouse_line(line: Element, i: int, converters: ValueConverters) -> WarehouseRow:
     """
-    Парсит warehouses.xml.
+    Разбирает один элемент <line> warehouses.xml (i - номер строки для сообщений).
+    Ошибки данных - RowParseError; значения преобразуются через converters.
     """
-    rows: list[WarehouseRow] = []
+    product_id_1c = line.attrib.get("product_id_1c")
+    stock_id_1c = line.attrib.get("stock_id_1c")
+
+    if not product_id_1c:
+        raise RowParseError(
+            f"Отсутствует обязательный атрибут 'product_id_1c' в строке #{i}.", "product_id_1c", ROW_ERROR_MISSING)
+    if not stock_id_1c:
+        raise RowParseError(
+            f"Отсутствует обязательный атрибут 'stock_id_1c' в строке #{i}.", "stock_id_1c", ROW_ERROR_MISSING)
+    stock_id_1c = sys.intern(stock_id_1c)
+
+    raw_price = line.attrib.get("price")
+    if raw_price is None:
+        raise RowParseError(f"Отсутствует атрибут 'price' в строке #{i}.", "price", ROW_ERROR_MISSING)
+
+    try:
+        price = converters.decimal(raw_price)
+    except InvalidOperation as e:
+        raise RowParseError(f"Некорректное значение 'price' в строке #{i}: '{raw_price}'.", "price") from e
+
+    edit_date = converters.parse_datetime_to_date(
+        line.attrib.get("edit_date"),
+        i,
+        "edit_date",
+    )
+
+    load_price_date = converters.parse_datetime_to_date(
+        line.attrib.get("load_price_date"),
+        i,
+        "load_price_date",
+    )
 
-    for i, line in enumerate(iter_lines(xml_path), start=6):
+    change_price_date = converters.parse_datetime_to_date(
+        line.attrib.get("change_price_date"),
+        i,
+        "change_price_date",
+    )
+
+    it_rrc = converters.parse_bool(
+        line.attrib.get("it_rrc"),
+        i,
+        "it_rrc",
+    )
+
+    arch = converters.parse_bool(
+        line.attrib.get("arch"),
+        i,
+        "arch",
+    )
+
+    return (
+        product_id_1c,
+        stock_id_1c,
+        edit_date,
+        price,
+        it_rrc,
+        change_price_date,
+        load_price_date,
+        arch,
+    )
+
+def parse_warehouses(reader: XmlReader, report: ImportReport) -> Iterator[WarehouseRow]:
+    """
+    Парсит warehouses.xml.
+    Генератор: строки отдаются по мере чтения файла.
+    """
+    converters = ValueConverters()
+    for i, line in enumerate(reader.lines(), start=FIRST_LINE_NUMBER):
 
         try:
-            product_id_1c = line.attrib.get("product_id_1c")
-            stock_id_1c = line.attrib.get("stock_id_1c")
-
-            if not product_id_1c:
-                raise ValueError(f"Отсутствует обязательный атрибут 'product_id_1c' в строке #{i}.")
-            if not stock_id_1c:
-                raise ValueError(f"Отсутствует обязательный атрибут 'stock_id_1c' в строке #{i}.")
-
-            raw_price = line.attrib.get("price")
-            if raw_price is None:
-                raise ValueError(f"Отсутствует атрибут 'price' в строке #{i}.")
-
-            try:
-                price = Decimal(raw_price)
-            except InvalidOperation as e:
-                raise ValueError(f"Некорректное значение 'price': '{raw_price}'.") from e
-
-            edit_date = parse_datetime_to_date(
-                line.attrib.get("edit_date"),
-                i,
-                "edit_date",
-            )
-
-            load_price_date = parse_datetime_to_date(
-                line.attrib.get("load_price_date"),
-                i,
-                "load_price_date",
-            )
-
-            change_price_date = parse_datetime_to_date(
-                line.attrib.get("change_price_date"),
-                i,
-                "change_price_date",
-            )
-
-            it_rrc = parse_bool(
-                line.attrib.get("it_rrc"),
-                i,
-                "it_rrc",
-            )
-
-            arch = parse_bool(
-                line.attrib.get("arch"),
-                i,
-                "arch",
-            )
-
-            rows.append(
-                (
-                    product_id_1c,
-                    stock_id_1c,
-                    edit_date,
-                    price,
-                    it_rrc,
-                    change_price_date,
-                    load_price_date,
-                    arch,
-                )
-            )
-
-        except ValueError as e:
-            report.add_row_error(i, str(e))
-            continue
+            yield _parse_warehouse_line(line, i, converters)
+
         except Exception as e:
-            report.add_row_error(i, f"Неизвестная ошибка парсинга: {e}")
+            report.add_row_error(i, *describe_row_error(e))
             continue
 
-    return rows
+    report.add_converter_cache_stats(converters.cache_stats())
 
 
-def import_warehouses(xml_path: Path, report: ImportReport) -> None:
+def import_warehouses(xml_path: Path, report: ImportReport, conn) -> None:
     """
     Импорт данных из warehouses.xml.
     """
     logger.info(f"Импорт файла '{FILE_WAREHOUSES}': {xml_path}")
 
-    is_delete = read_delete_flag(xml_path)
-    logger.info(f"Параметры импорта: delete={is_delete}")
+    reader = XmlReader(xml_path)
+    if reader.header.info_update_date:
+        report.set_info_update_date(reader.header.info_update_date)
+
+    if use_parallel_parse(xml_path):
+        reader.close()
+        source = ChunkedXmlParser(xml_path, _parse_warehouse_line)
+        logger.info(f"Параллельный разбор файла: процессов={source.workers}")
+        rows = source.rows(report)
+    else:
+        source = reader
+        rows = parse_warehouses(reader, report)
+
+    rows = checkpoint_rows(
+        xml_path,
+        rows,
+        source,
+        report.row_errors,
+        file=FILE_WAREHOUSES,
+    )
 
-    rows = _parse_warehouses(xml_path, report)
+    sync_results = sync_data(
+        conn,
+        rows=report.timings.measure_iter("parse", rows),
+        is_delete=lambda: source.header.is_delete,
+        timings=report.timings,
+        cfg=SQL_CONFIG[TABLE_WAREHOUSES],
+    )
 
-    report.set_products_parsed(len(rows))
+    report.set_products_parsed(sync_results["rows_parsed"])
+    report.set_content_hash(source.content_hash)
+    report.timings.record("parse", bytes_count=source.bytes_read)
 
-    if not rows:
+    if not sync_results["rows_parsed"]:
         logger.warning(f"В файле {xml_path.name} нет валидных строк для импорта.")
         return
 
-    logger.info(f"Подготовлено строк к загрузке: count={len(rows)}")
-
-    sync_results = sync_data(
-        rows=rows,
-        is_delete=is_delete,
-        cfg=SQL_CONFIG[TABLE_WAREHOUSES],
-    )
-
     report.set_metrics({
         "db_inserted": sync_results["db_inserted"],
         "db_updated": sync_results["db_updated"],
-        "db_deleted": sync_results["db_deleted"]
+        "db_deleted": sync_results["db_deleted"],
+        "rows_unchanged": sync_results["rows_unchanged"],
     })
 
     logger.success(f"Импорт '{FILE_WAREHOUSES}' завершён.")
@@ -1,18 +1,41 @@
+import re
 import sys
+import argparse
 
 from mariadb import Error as mariadb_error
 
 from importer.config import (
     DB_APP_ALLOWED_HOST,
+    SQL_CONFIG,
     SQL_DIR,
     STOCK_PRICES_TABLES,
     TABLE_PROD_DROP,
+    TABLE_STOCK_PRICES,
     TABLE_WAREHOUSES,
     admin_db_config,
     app_db_config,
 )
 from importer.db import close_db, connect_db
 from importer.logger import logger
+from importer.sql_files import load_sql
+
+
+# Колонки таблиц магазина, по которым SQL синхронизации stock_prices соединяется
+# с временными таблицами: без индекса каждый запрос читает таблицу целиком.
+JOIN_KEY_COLUMNS = [
+    ("shop_product", "id_1c"),
+    ("shop_product_skus", "id_1c"),
+    ("shop_stock", "id_1c"),
+]
+# SQL-файлы создания и заполнения временных таблиц: не проверяются через EXPLAIN.
+_STAGING_SQL_KEYS = {
+    "tmp_table", "tmp_deleted", "tmp_products", "tmp_stocks", "insert_tmp_products", "insert_tmp_stocks",
+}
+_SQL_COMMENT = re.compile(r"--[^\n]*")
+_TABLE_ALIAS = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|SET\b|WHERE\b|LEFT\b|JOIN\b|SELECT\b)(\w+))?",
+    re.IGNORECASE,
+)
 
 
 def _table_exists(admin_cursor, table_name: str) -> bool:
@@ -112,7 +135,122 @@ def configure_application_user(admin_cursor, tables: list) -> None:
         logger.error(f"Ошибка при настройке пользователя БД: {e}")
         raise
 
-def main(init_schema: bool = False):
+def _leading_index_columns(admin_cursor, table_name: str) -> set[str]:
+    """Колонки, с которых начинается хотя бы один индекс таблицы."""
+    admin_cursor.execute("""
+        SELECT DISTINCT column_name
+        FROM information_schema.statistics
+        WHERE table_schema = %s AND table_name = %s AND seq_in_index = 1
+        """, (admin_db_config.database, table_name))
+    return {row[0].lower() for row in admin_cursor.fetchall()}
+
+def _audit_tmp_tables() -> list[tuple[str, str, str]]:
+    """
+    Временные таблицы синхронизации: (SQL-файл создания, имя, ключевые колонки).
+    """
+    tables = []
+    for cfg in SQL_CONFIG.values():
+        if "target_table" in cfg:
+            tmp_table = f"tmp_{cfg['target_table']}"
+            tables.append((cfg["tmp_table"], tmp_table, cfg["key_columns"]))
+            tables.append((cfg["tmp_deleted"], f"{tmp_table}_deleted", cfg["key_columns"]))
+    cfg = SQL_CONFIG[TABLE_STOCK_PRICES]
+    tables.append((cfg["tmp_products"], cfg["tmp_products_table"], "product_id_1c"))
+    tables.append((cfg["tmp_stocks"], cfg["tmp_stocks_table"], "product_id_1c, stock_id_1c"))
+    return tables
+
+def _create_audit_tmp_tables(admin_cursor) -> None:
+    """
+    Создает временные таблицы синхронизации в сессии администратора.
+    Каждая получает две фиктивные строки: пустую таблицу оптимизатор считает
+    константой, и план остальных соединений не показывается.
+    """
+    for sql_file, table, key_columns in _audit_tmp_tables():
+        admin_cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+        admin_cursor.execute(load_sql(sql_file))
+        columns = [column.strip() for column in key_columns.split(",")]
+        for n in (1, 2):
+            values = ", ".join(f"'audit_{n}'" for _ in columns)
+            admin_cursor.execute(f"INSERT INTO {table} ({key_columns}) VALUES ({values})")
+
+def explain_sync_statements(admin_cursor) -> list[str]:
+    """
+    Выполняет EXPLAIN для SQL синхронизации из SQL_CONFIG (кроме создания и
+    заполнения временных таблиц и запросов с параметрами). Возвращает описания
+    полных сканирований таблиц БД (type=ALL); временные таблицы не учитываются:
+    они читаются целиком по замыслу.
+    """
+    _create_audit_tmp_tables(admin_cursor)
+    full_scans = []
+    for table_key, cfg in SQL_CONFIG.items():
+        for step, value in cfg.items():
+            if not (isinstance(value, str) and value.endswith(".sql")) or step in _STAGING_SQL_KEYS:
+                continue
+            sql = load_sql(value)
+            if "%s" in sql:
+                logger.info(f"EXPLAIN {value}: пропущен (запрос с параметрами).")
+                continue
+
+            aliases = {}
+            for table, alias in _TABLE_ALIAS.findall(_SQL_COMMENT.sub("", sql)):
+                aliases[(alias or table).lower()] = table
+            try:
+                admin_cursor.execute(f"EXPLAIN {sql}")
+            except mariadb_error as e:
+                logger.warning(f"EXPLAIN {value}: не выполнен ({e}).")
+                continue
+
+            columns = [column[0].lower() for column in admin_cursor.description]
+            table_index, type_index, rows_index = (columns.index(name) for name in ("table", "type", "rows"))
+            for row in admin_cursor.fetchall():
+                table = aliases.get(str(row[table_index]).lower(), str(row[table_index]))
+                if row[type_index] != "ALL" or table.startswith(("tmp_", "<")):
+                    continue
+                message = f"{table_key}.{step} ({value}): полное сканирование {table}, строк ~{row[rows_index]}"
+                full_scans.append(message)
+                logger.warning(message)
+    return full_scans
+
+def provision_join_indexes(admin_cursor, assume_yes: bool = False) -> int:
+    """
+    Проверяет индексы на JOIN_KEY_COLUMNS и после подтверждения администратора
+    создает недостающие (ALGORITHM=INPLACE, LOCK=NONE: без блокировки записи).
+    Возвращает число созданных индексов.
+    """
+    created = 0
+    for table, column in JOIN_KEY_COLUMNS:
+        if not _table_exists(admin_cursor, table):
+            logger.warning(f"Таблица '{table}' не найдена, проверка индекса пропущена.")
+            continue
+        if column in _leading_index_columns(admin_cursor, table):
+            logger.info(f"Индекс {table}({column}) есть.")
+            continue
+
+        index_name = f"idx_{column}"
+        statement = f"ALTER TABLE {table} ADD INDEX {index_name} ({column}), ALGORITHM=INPLACE, LOCK=NONE"
+        logger.warning(f"Нет индекса {table}({column}): запросы синхронизации сканируют таблицу целиком.")
+        if not assume_yes:
+            answer = input(f"Выполнить '{statement}'? [y/N]: ")
+            if answer.strip().lower() not in ("y", "yes", "д", "да"):
+                logger.info(f"Создание индекса {table}({column}) пропущено.")
+                continue
+        logger.info(f"Создание индекса: {statement}")
+        admin_cursor.execute(statement)
+        created += 1
+        logger.info(f"Индекс {table}.{index_name} создан.")
+    return created
+
+def audit_indexes(admin_cursor, assume_yes: bool = False) -> None:
+    """
+    Аудит индексов для SQL синхронизации: EXPLAIN всех запросов и создание
+    недостающих индексов на id_1c; после создания EXPLAIN повторяется.
+    """
+    full_scans = explain_sync_statements(admin_cursor)
+    if provision_join_indexes(admin_cursor, assume_yes) and full_scans:
+        full_scans = explain_sync_statements(admin_cursor)
+    logger.info(f"Аудит индексов завершен, полных сканирований: {len(full_scans)}.")
+
+def main(init_schema: bool = False, audit: bool = False, assume_yes: bool = False):
     """Основная функция инициализации базы данных."""
     logger.info("=== НАЧАЛО ИНИЦИАЛИЗАЦИИ БД ===")
 
@@ -122,6 +260,12 @@ def main(init_schema: bool = False):
         admin_connection = connect_db(config=admin_db_config)
         admin_cursor = admin_connection.cursor()
 
+        if audit:
+            audit_indexes(admin_cursor, assume_yes)
+            admin_connection.commit()
+            logger.info("=== АУДИТ ИНДЕКСОВ ЗАВЕРШЕН ===")
+            return
+
         tables = [TABLE_PROD_DROP, TABLE_WAREHOUSES]
 
         if init_schema:
@@ -143,4 +287,12 @@ def main(init_schema: bool = False):
             close_db(admin_connection)
 
 if __name__ == "__main__":
-    main(init_schema=False)
+    parser = argparse.ArgumentParser(description="Инициализация базы данных.")
+    parser.add_argument(
+        "--audit-indexes",
+        action="store_true",
+        help="Проверить индексы для SQL синхронизации (EXPLAIN) и создать недостающие индексы на id_1c.",
+    )
+    parser.add_argument("--yes", action="store_true", help="Создавать индексы без подтверждения.")
+    args = parser.parse_args()
+    main(init_schema=False, audit=args.audit_indexes, assume_yes=args.yes)
@@ -1,26 +1,41 @@
-import json
+from __future__ import annotations
+
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
+from importer.checkpoint import RowSpool
 from importer.config import (
     DATE_FORMAT_LOG,
     FAILED_DIR,
     FILE_PROD_DOP,
     FILE_STOCK_PRICES,
     FILE_WAREHOUSES,
+    IMPORT_CONCURRENCY,
     IMPORT_DIR,
     REPORT_DIR,
     REPORT_FILE_NAME,
     UNKNOWN_DIR,
 )
-from importer.db import check_db_connection
+from importer.db import ConnectionPool
 from importer.import_prod_dop import import_prod_dop
 from importer.import_stock_prices import import_stock_prices
 from importer.import_warehouses import import_warehouses
 from importer.logger import logger
-from importer.report import ImportReport, filter_reports_by_retention, load_existing_reports
-from importer.xml_utils import get_info_update_date, get_xml_files
+from importer.manifest import HashManifest
+from importer.report import ImportReport, save_reports
+from importer.xml_utils import get_xml_files, xml_base_name
+
 
+IMPORTERS = {
+    FILE_PROD_DOP: import_prod_dop,
+    FILE_WAREHOUSES: import_warehouses,
+    FILE_STOCK_PRICES: import_stock_prices,
+}
+# Статус импорта файла в FAILED_DIR (<файл>.status): по нему reprocess_failed
+# отличает упавшие файлы от синхронизированных с ошибками строк.
+FAILED_STATUS_SUFFIX = ".status"
 
 def main():
     """
@@ -34,72 +49,138 @@ def main():
         logger.warning(f"XML-файлы отсутствуют в директории {IMPORT_DIR}.")
         return
 
-    if not check_db_connection():
-        logger.critical("Нет связи с БД. Синхронизация таблиц остановлена.")
-        return
-
-    report_file_path = REPORT_DIR / REPORT_FILE_NAME
-    history_reports = load_existing_reports(report_file_path)
-
-    for file_path in xml_files:
-        report = ImportReport(file_path.name)
-
-        xml_date = get_info_update_date(file_path)
-        if xml_date:
-            report.set_info_update_date(xml_date)
+    pool = ConnectionPool(size=IMPORT_CONCURRENCY)
+    try:
+        if not pool.check():
+            logger.critical("Нет связи с БД. Синхронизация таблиц остановлена.")
+            return
+        process_files(xml_files, pool)
+    finally:
+        pool.close()
 
-        try:
-            logger.info(f"Начат разбор файла: '{file_path.name}'")
+    logger.info("Работа обработчика завершена.")
 
-            if file_path.name not in [FILE_PROD_DOP, FILE_WAREHOUSES, FILE_STOCK_PRICES]:
-                logger.warning(f"Неизвестный XML-файл: '{file_path.name}'")
-                dest_path = UNKNOWN_DIR / file_path.name
-                shutil.move(str(file_path), str(dest_path))
-                logger.warning(f"Файл перемещен в unknown: {dest_path}")
-                continue
+def failed_status_path(file_path: Path) -> Path:
+    return file_path.with_name(f"{file_path.name}{FAILED_STATUS_SUFFIX}")
 
-            if file_path.name == FILE_PROD_DOP:
-                import_prod_dop(file_path, report)
-            elif file_path.name == FILE_WAREHOUSES:
-                import_warehouses(file_path, report)
-            elif file_path.name == FILE_STOCK_PRICES:
-                import_stock_prices(file_path, report)
+def write_failed_status(file_path: Path, status: str) -> None:
+    """Записывает статус импорта рядом с файлом в FAILED_DIR."""
+    try:
+        failed_status_path(file_path).write_text(status, encoding="utf-8")
+    except OSError as e:
+        logger.error(f"Не удалось записать статус файла '{file_path.name}': {e}")
 
-            report.set_success()
+def read_failed_status(file_path: Path) -> str | None:
+    """Статус импорта файла в FAILED_DIR; None, если он не записан."""
+    try:
+        return failed_status_path(file_path).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+def import_file(
+        file_path: Path,
+        pool: ConnectionPool,
+        manifest: HashManifest,
+        file_type: str | None = None,
+    ) -> ImportReport | None:
+    """
+    Импортирует один файл (в том числе сжатый, тип определяется по имени
+    без расширения сжатия или задается file_type). Возвращает отчет или None
+    для неизвестного файла. Файл, совпадающий по содержимому с последним
+    успешно примененным, не разбирается и не пишется в БД (статус skipped).
+    Спул строк (CHECKPOINT_SPOOL) и статус импорта при ошибке переносятся
+    в failed рядом с файлом.
+    """
+    file_type = file_type or xml_base_name(file_path)
+    report = ImportReport(file_type)
+    spool = RowSpool.for_file(file_path)
 
-            if report.status == "success":
+    try:
+        logger.info(f"Начат разбор файла: '{file_path.name}'")
+
+        importer = IMPORTERS.get(file_type)
+        if importer is None:
+            logger.warning(f"Неизвестный XML-файл: '{file_path.name}'")
+            dest_path = UNKNOWN_DIR / file_path.name
+            shutil.move(str(file_path), str(dest_path))
+            logger.warning(f"Файл перемещен в unknown: {dest_path}")
+            return None
+
+        with report.timings.span("total") as total_span:
+            total_span.bytes = file_path.stat().st_size
+            with report.timings.span("hash_check"):
+                unchanged = manifest.is_unchanged(file_type, file_path)
+            if unchanged:
+                report.set_content_hash(manifest.last_hash(file_type))
+                report.set_skipped()
                 file_path.unlink()
-                logger.info(f"Файл синхронизирован и удален: '{file_path.name}'")
-            else:
-                logger.warning(f"Файл синхронизирован с ошибками ({report.status}). Перемещение в failed.")
-                raise RuntimeError(f"Импорт завершен со статусом: {report.status}")
+                logger.info(f"Файл не изменился с последнего импорта, пропущен и удален: '{file_path.name}'")
+                return report
 
-        except Exception as e:
-            logger.warning(f"Файл '{file_path.name}' требует проверки. Статус: {report.status}")
-            if report.status == "pending":
-                report.set_failed(e)
+            with pool.connection() as conn:
+                importer(file_path, report, conn)
+        spool.discard()
 
-            try:
-                timestamp = datetime.now().strftime(DATE_FORMAT_LOG)
-                new_name = f"{file_path.stem}_{timestamp}{file_path.suffix}"
-                dest_path = FAILED_DIR / new_name
-                shutil.move(str(file_path), str(dest_path))
-                logger.warning(f"Файл перемещен в failed: {dest_path}")
-            except OSError as move_err:
-                logger.error(f"Не удалось переместить файл '{file_path.name}': {move_err}")
+        report.set_success()
 
-        history_reports.append(report.to_dict())
+        if report.status == "success":
+            if report.content_hash:
+                manifest.record(file_type, file_path, report.content_hash)
+            file_path.unlink()
+            logger.info(f"Файл синхронизирован и удален: '{file_path.name}'")
+        else:
+            logger.warning(f"Файл синхронизирован с ошибками ({report.status}). Перемещение в failed.")
+            raise RuntimeError(f"Импорт завершен со статусом: {report.status}")
 
-    history_reports = filter_reports_by_retention(history_reports, hours=24)
-
-    try:
-        with open(report_file_path, "w", encoding="utf-8") as f:
-            json.dump(history_reports, f, ensure_ascii=False, indent=2)
-        logger.info(f"Отчет сохранен: {report_file_path}")
     except Exception as e:
-        logger.exception(f"Ошибка при сохранении отчета: {e}")
+        logger.warning(f"Файл '{file_path.name}' требует проверки. Статус: {report.status}")
+        if report.status == "pending":
+            report.set_failed(e)
 
-    logger.info("Работа обработчика завершена.")
+        try:
+            timestamp = datetime.now().strftime(DATE_FORMAT_LOG)
+            extension = file_path.name[len(Path(xml_base_name(file_path)).stem):]
+            new_name = f"{Path(file_type).stem}_{timestamp}{extension}"
+            dest_path = FAILED_DIR / new_name
+            shutil.move(str(file_path), str(dest_path))
+            logger.warning(f"Файл перемещен в failed: {dest_path}")
+            write_failed_status(dest_path, report.status)
+            spool.move_beside(dest_path)
+        except OSError as move_err:
+            logger.error(f"Не удалось переместить файл '{file_path.name}': {move_err}")
+
+    return report
+
+def _import_group(files: list[Path], pool: ConnectionPool, manifest: HashManifest) -> list[ImportReport]:
+    """
+    Последовательно импортирует файлы одного типа (одни и те же таблицы).
+    """
+    reports = []
+    for file_path in files:
+        report = import_file(file_path, pool, manifest)
+        if report is not None:
+            reports.append(report)
+    return reports
+
+def process_files(xml_files: list[Path], pool: ConnectionPool) -> None:
+    """
+    Импортирует файлы параллельно: по одному потоку на тип файла
+    (типы затрагивают непересекающиеся таблицы), не более IMPORT_CONCURRENCY
+    одновременно. Отчеты собираются в основном потоке и сохраняются вместе.
+    """
+    groups: dict[str, list[Path]] = {}
+    for file_path in xml_files:
+        groups.setdefault(xml_base_name(file_path), []).append(file_path)
+
+    manifest = HashManifest()
+    reports: list[ImportReport] = []
+    workers = min(IMPORT_CONCURRENCY, len(groups))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as executor:
+        futures = [executor.submit(_import_group, files, pool, manifest) for files in groups.values()]
+        for future in futures:
+            reports.extend(future.result())
+
+    save_reports(reports, REPORT_DIR / REPORT_FILE_NAME)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from importer.config import MANIFEST_FILE
+from importer.logger import logger
+from importer.xml_utils import file_edges_sha256, file_sha256
+
+
+class HashManifest:
+    """
+    Манифест хэшей содержимого последних успешно примененных файлов
+    по типам (имени файла). Позволяет пропускать повторные выгрузки
+    без изменений.
+    """
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = self._load()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Манифест хэшей поврежден и будет пересоздан: {e}")
+            return {}
+
+    def last_hash(self, file_type: str) -> str | None:
+        """Хэш последнего успешно примененного файла этого типа."""
+        return self._entries.get(file_type, {}).get("sha256")
+
+    def last_applied_at(self, file_type: str) -> datetime | None:
+        """Время последнего успешного применения файла этого типа."""
+        applied_at = self._entries.get(file_type, {}).get("applied_at")
+        return datetime.fromisoformat(applied_at) if applied_at else None
+
+    def is_unchanged(self, file_type: str, file_path: Path) -> bool:
+        """
+        True, если файл совпадает с последним успешно примененным файлом этого типа.
+        Полный хэш считается только при совпадении размера и отпечатка первого
+        и последнего блоков; иначе файл заведомо изменился и хэш будет посчитан
+        во время парсинга.
+        """
+        entry = self._entries.get(file_type)
+        if not entry or entry.get("size") != file_path.stat().st_size:
+            return False
+        if entry.get("edges_sha256") and entry["edges_sha256"] != file_edges_sha256(file_path):
+            return False
+        return file_sha256(file_path) == entry.get("sha256")
+
+    def record(self, file_type: str, file_path: Path, content_hash: str) -> None:
+        """
+        Запоминает хэш, размер и отпечаток блоков успешно примененного файла
+        и атомарно сохраняет манифест.
+        """
+        size = file_path.stat().st_size
+        edges_hash = file_edges_sha256(file_path)
+        with self._lock:
+            self._entries[file_type] = {
+                "sha256": content_hash,
+                "size": size,
+                "edges_sha256": edges_hash,
+                "applied_at": datetime.now().astimezone().replace(microsecond=0).isoformat(),
+            }
+            tmp_path = self.path.with_suffix(".tmp")
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить манифест хэшей: {e}")
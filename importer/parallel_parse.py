@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Iterator
+from xml.etree.ElementTree import Element, ParseError
+
+from importer.config import (
+    PARALLEL_PARSE_CHUNK_BYTES,
+    PARALLEL_PARSE_MIN_BYTES,
+    PARALLEL_PARSE_WORKERS,
+)
+from importer.report import ImportReport
+from importer.xml_utils import (
+    FIRST_LINE_NUMBER,
+    HASH_CHUNK_SIZE,
+    PARSE_ERRORS,
+    XML_BACKENDS,
+    ValueConverters,
+    XmlHeader,
+    describe_row_error,
+    is_compressed,
+    resolve_xml_backend,
+)
+
+
+# Начало <line> и разделы, внутри которых "<line" - не разметка (комментарии, CDATA, инструкции).
+MARKUP = re.compile(rb"<line[\s/>]|<!--|<!\[CDATA\[|<\?")
+SKIPPED_SECTION_END = {b"<!--": b"-->", b"<![CDATA[": b"]]>", b"<?": b"?>"}
+# Конец элемента <line>, начинающегося с первого байта: <line .../> или <line ...>...</line>.
+LINE_ELEMENT = re.compile(rb"<line(?:[\s/][^<]*)?/>|<line[\s>].*?</line\s*>", re.DOTALL)
+XML_ENCODING = re.compile(rb"""<\?xml[^>]*encoding=["']([A-Za-z0-9._-]+)["']""")
+# Хвост блока, который переносится в следующий: совпадение может начаться в конце блока.
+SCAN_OVERLAP = 8
+WINDOW_PER_WORKER = 2
+
+ParseLine = Callable[[Element, int, ValueConverters], Any]
+
+# Конвертеры процесса-обработчика: кэши сохраняются между диапазонами одного файла.
+_worker_converters: ValueConverters | None = None
+
+
+@dataclass(frozen=True)
+class ByteChunk:
+    """
+    Диапазон байт [start, end) из целых элементов <line>;
+    first_line - номер первого из них в нумерации отчета.
+    """
+    start: int
+    end: int
+    first_line: int
+
+def parallel_parse_workers() -> int:
+    """PARALLEL_PARSE_WORKERS, но не больше числа ядер."""
+    return min(PARALLEL_PARSE_WORKERS, os.cpu_count() or 1)
+
+def use_parallel_parse(xml_path: Path) -> bool:
+    """
+    Параллельный разбор включен (больше одного процесса с учетом числа ядер),
+    файл не сжат (диапазоны байт задаются по несжатому XML) и не меньше
+    PARALLEL_PARSE_MIN_BYTES.
+    """
+    return (
+        parallel_parse_workers() > 1
+        and not is_compressed(xml_path)
+        and xml_path.stat().st_size >= PARALLEL_PARSE_MIN_BYTES
+    )
+
+def compact_row(row: tuple) -> tuple:
+    """
+    Decimal и date передаются между процессами строками (в том же виде,
+    в каком попадают во временную таблицу): так пачки в разы быстрее
+    сериализуются и восстанавливаются в основном процессе.
+    """
+    return tuple(str(value) if isinstance(value, (Decimal, date)) else value for value in row)
+
+def _parse_chunk(
+        xml_path: str,
+        chunk: ByteChunk,
+        encoding: str,
+        backend: str,
+        parse_line: ParseLine,
+    ) -> tuple[list[Any], list[tuple[int, str]], dict[str, tuple[int, int]]]:
+    """
+    Выполняется в процессе-обработчике: разбирает диапазон байт как
+    фрагмент <lines>...</lines>. Возвращает компактные строки, ошибки
+    (номер, текст) и счетчики кэшей конвертеров за этот диапазон.
+    """
+    global _worker_converters
+    if _worker_converters is None:
+        _worker_converters = ValueConverters()
+    converters = _worker_converters
+    cache_before = converters.cache_stats()
+
+    with open(xml_path, "rb") as f:
+        f.seek(chunk.start)
+        data = f.read(chunk.end - chunk.start)
+
+    prolog = f'<?xml version="1.0" encoding="{encoding}"?><lines>'.encode("ascii")
+    source = io.BytesIO(prolog + data + b"</lines>")
+    rows: list[Any] = []
+    errors: list[tuple[int, str, str, str | None]] = []
+    i = chunk.first_line
+    try:
+        for event, line in XML_BACKENDS[backend](source, ("line",)):
+            if event != "end":
+                continue
+            try:
+                rows.append(compact_row(parse_line(line, i, converters)))
+            except Exception as e:
+                errors.append((i, *describe_row_error(e)))
+            line.clear()
+            i += 1
+    except PARSE_ERRORS as e:
+        raise ParseError(f"Критическая ошибка структуры XML (байты {chunk.start}-{chunk.end}): {e}") from None
+    cache_stats = {
+        name: (hits - cache_before.get(name, (0, 0))[0], misses - cache_before.get(name, (0, 0))[1])
+        for name, (hits, misses) in converters.cache_stats().items()
+    }
+    return rows, errors, cache_stats
+
+class ChunkedXmlParser:
+    """
+    Параллельный разбор большого файла по диапазонам байт.
+    Один последовательный проход находит границы элементов <line>
+    (по PARALLEL_PARSE_CHUNK_BYTES), считает их для сквозной нумерации
+    и SHA-256 файла. Диапазоны разбираются в ProcessPoolExecutor функцией
+    разбора одной строки импортера, результаты отдаются в исходном порядке.
+    После прохода header содержит параметры выгрузки, в том числе флаги,
+    расположенные после строк.
+    """
+    def __init__(
+            self,
+            xml_path: Path,
+            parse_line: ParseLine,
+            workers: int | None = None,
+            chunk_bytes: int = PARALLEL_PARSE_CHUNK_BYTES,
+        ):
+        self.xml_path = xml_path
+        self.parse_line = parse_line
+        self.workers = workers or parallel_parse_workers()
+        self.chunk_bytes = chunk_bytes
+        self.backend = resolve_xml_backend()
+        self.encoding = "utf-8"
+        self.header = XmlHeader()
+        self.content_hash: str | None = None
+        self.bytes_read = 0
+
+    def _iter_chunks(self) -> Iterator[ByteChunk]:
+        digest = hashlib.sha256()
+        line_number = FIRST_LINE_NUMBER
+        first_line: int | None = None
+        chunk_start: int | None = None
+        chunk_first_line = line_number
+        last_line = -1
+        section_end: bytes | None = None
+        buffer = b""
+        buffer_offset = 0
+
+        with open(self.xml_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+                if not self.bytes_read:
+                    match = XML_ENCODING.search(block)
+                    if match:
+                        self.encoding = match.group(1).decode("ascii")
+                self.bytes_read += len(block)
+                buffer += block
+
+                pos = 0
+                while True:
+                    if section_end is not None:
+                        end = buffer.find(section_end, pos)
+                        if end < 0:
+                            break
+                        pos = end + len(section_end)
+                        section_end = None
+                        continue
+                    match = MARKUP.search(buffer, pos)
+                    if match is None:
+                        break
+                    pos = match.end()
+                    if match.group() in SKIPPED_SECTION_END:
+                        section_end = SKIPPED_SECTION_END[match.group()]
+                        continue
+                    last_line = buffer_offset + match.start()
+                    if chunk_start is None:
+                        first_line = chunk_start = last_line
+                    elif last_line - chunk_start >= self.chunk_bytes:
+                        yield ByteChunk(chunk_start, last_line, chunk_first_line)
+                        chunk_start = last_line
+                        chunk_first_line = line_number
+                    line_number += 1
+
+                keep = max(pos, len(buffer) - SCAN_OVERLAP)
+                buffer_offset += keep
+                buffer = buffer[keep:]
+
+            self.content_hash = digest.hexdigest()
+            if chunk_start is None:
+                self._read_header(f, self.bytes_read, self.bytes_read)
+                return
+            lines_end = self._line_end(f, last_line)
+            self._read_header(f, first_line, lines_end)
+            yield ByteChunk(chunk_start, lines_end, chunk_first_line)
+
+    def _line_end(self, f, line_start: int) -> int:
+        """
+        Конец последнего элемента <line>: последний диапазон не должен
+        захватывать закрывающие теги (</lines>, </root>) и элементы после строк.
+        """
+        f.seek(line_start)
+        match = LINE_ELEMENT.match(f.read())
+        if match is None:
+            raise ParseError(f"Критическая ошибка структуры XML: не закрыт элемент <line> (байт {line_start}).")
+        return line_start + match.end()
+
+    def _read_header(self, f, lines_start: int, lines_end: int) -> None:
+        """
+        Разбирает файл без строк (байты до первого <line> и после последнего):
+        заголовок и флаги в конце файла попадают в header.
+        """
+        f.seek(0)
+        head = f.read(lines_start)
+        f.seek(lines_end)
+        source = io.BytesIO(head + f.read())
+        try:
+            for event, elem in XML_BACKENDS[self.backend](source, XmlHeader.TAGS):
+                self.header.update(event, elem)
+        except PARSE_ERRORS as e:
+            raise ParseError(f"Критическая ошибка структуры XML: {e}") from None
+
+    def _collect(self, future: Future, report: ImportReport) -> list[Any]:
+        rows, errors, cache_stats = future.result()
+        for line_number, message, kind, field in errors:
+            report.add_row_error(line_number, message, kind, field)
+        report.add_converter_cache_stats(cache_stats)
+        return rows
+
+    def rows(self, report: ImportReport) -> Iterator[Any]:
+        """
+        Генератор строк в порядке файла. Ошибки строк записываются в report
+        с номерами, совпадающими с последовательным разбором.
+        """
+        window = self.workers * WINDOW_PER_WORKER
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            pending: deque[Future] = deque()
+            try:
+                for chunk in self._iter_chunks():
+                    pending.append(executor.submit(
+                        _parse_chunk, str(self.xml_path), chunk, self.encoding, self.backend, self.parse_line,
+                    ))
+                    if len(pending) >= window:
+                        yield from self._collect(pending.popleft(), report)
+                while pending:
+                    yield from self._collect(pending.popleft(), report)
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+
+T = TypeVar("T")
+
+QUEUE_MAX_BATCHES = 2
+PUT_TIMEOUT_SEC = 0.5
+
+_DONE = object()
+
+
+class _ProducerFailure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def iter_batches(rows: Iterable[T], size: int) -> Iterator[list[T]]:
+    """
+    Группирует поток строк в пачки не более size элементов.
+    """
+    batch: list[T] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def threaded_batches(
+        rows: Iterable[T],
+        size: int,
+        max_batches: int = QUEUE_MAX_BATCHES,
+    ) -> Iterator[list[T]]:
+    """
+    Потоковый конвейер parse -> load.
+    Источник rows (парсер XML) выполняется в отдельном потоке-производителе,
+    вызывающий код получает пачки по мере готовности. Очередь ограничена
+    max_batches пачками, поэтому память не зависит от размера файла.
+    Исключение производителя пробрасывается потребителю.
+    Генератор следует закрывать (contextlib.closing), чтобы при ошибке
+    на стороне БД поток парсинга был остановлен, а источник закрыт.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max_batches)
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=PUT_TIMEOUT_SEC)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for batch in iter_batches(rows, size):
+                if not put(batch):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_ProducerFailure(e))
+        finally:
+            # Источник закрывается в том же потоке, где он выполнялся: при
+            # остановке потребителя генератор парсера освобождает файл сразу.
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name="xml-parser", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _ProducerFailure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        producer.join()
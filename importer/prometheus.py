@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import os
+import json
+import fcntl
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from importer.config import METRICS_STATE_FILE, METRICS_TEXTFILE_DIR
+from importer.logger import logger
+
+
+METRICS_FILE_NAME = "xml_importer.prom"
+METRIC_PREFIX = "xml_importer"
+# Границы корзин гистограммы длительности импорта, сек.
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+SUCCESS_STATUSES = ("success", "completed_with_errors", "skipped")
+# Поля отчета, которые считают строки и суммируются в rows_total. Остальные
+# целые метрики (from_spool, chunks_committed, batches, ...) - признаки и счетчики
+# одного прогона, они экспортируются только в last_run_value.
+ROW_METRICS = frozenset({
+    "products_parsed",
+    "rows_unchanged",
+    "rows_purged",
+    "db_inserted",
+    "db_updated",
+    "db_deleted",
+    "products_updated",
+    "products_unchanged",
+    "products_reset",
+    "skus_updated",
+    "skus_unchanged",
+    "skus_reset",
+    "stocks_upserted",
+    "stocks_deleted",
+    "stocks_logged",
+})
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{_label_value(str(value))}"' for name, value in labels.items()) + "}"
+
+def _timestamp(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+def _update_state(state: dict[str, Any], entry: dict[str, Any]) -> None:
+    """Добавляет отчет к накопленному состоянию метрик его файла."""
+    file = entry.get("file", "")
+    timings = entry.get("timings") or {}
+    duration = (timings.get("total") or {}).get("duration_sec") or 0.0
+    finished_ts = _timestamp(entry.get("finished_at"))
+    status = entry.get("status") or "unknown"
+
+    file_state = state.setdefault(file, {
+        "runs": {},
+        "rows": {},
+        "row_errors": 0,
+        "duration": {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0},
+    })
+    file_state["runs"][status] = file_state["runs"].get(status, 0) + 1
+    file_state["row_errors"] += entry.get("row_errors_total") or 0
+
+    histogram = file_state["duration"]
+    for index, bound in enumerate(DURATION_BUCKETS):
+        if duration <= bound:
+            histogram["buckets"][index] += 1
+    histogram["sum"] += duration
+    histogram["count"] += 1
+
+    last_rows = {"products_parsed": entry.get("products_parsed") or 0}
+    last_values = {}
+    for name, value in (entry.get("metrics") or {}).items():
+        if not isinstance(value, int):
+            continue
+        if name in ROW_METRICS:
+            last_rows[name] = value
+        else:
+            last_values[name] = int(value)
+    for name, value in last_rows.items():
+        file_state["rows"][name] = file_state["rows"].get(name, 0) + value
+
+    file_state["last_run"] = {
+        "timestamp": finished_ts,
+        "status": status,
+        "rows": last_rows,
+        "values": last_values,
+        "row_errors": entry.get("row_errors_total") or 0,
+        "phases": {name: phase.get("duration_sec") or 0.0 for name, phase in timings.items()},
+        "file_bytes": (timings.get("parse") or {}).get("bytes") or 0,
+    }
+    if status in SUCCESS_STATUSES and finished_ts is not None:
+        file_state["last_success"] = finished_ts
+
+def render_metrics(state: dict[str, Any]) -> str:
+    """Текст метрик в формате Prometheus text exposition."""
+    families: dict[str, tuple[str, str, list[str]]] = {}
+
+    def add(name: str, kind: str, help_text: str, sample: str) -> None:
+        families.setdefault(name, (kind, help_text, []))[2].append(sample)
+
+    prefix = METRIC_PREFIX
+    for file, file_state in sorted(state.items()):
+        for status, count in sorted(file_state["runs"].items()):
+            add(f"{prefix}_runs_total", "counter", "Число импортов по файлу и статусу.",
+                f"{prefix}_runs_total{_labels(file=file, status=status)} {count}")
+        for name, value in sorted(file_state["rows"].items()):
+            if name not in ROW_METRICS:
+                continue
+            add(f"{prefix}_rows_total", "counter", "Накопленные счетчики строк (metric - поле отчета).",
+                f"{prefix}_rows_total{_labels(file=file, metric=name)} {value}")
+        add(f"{prefix}_row_errors_total", "counter", "Накопленное число ошибок строк.",
+            f"{prefix}_row_errors_total{_labels(file=file)} {file_state['row_errors']}")
+
+        histogram = file_state["duration"]
+        name = f"{prefix}_import_duration_seconds"
+        for index, bound in enumerate(DURATION_BUCKETS):
+            add(name, "histogram", "Длительность импорта файла.",
+                f"{name}_bucket{_labels(file=file, le=str(bound))} {histogram['buckets'][index]}")
+        add(name, "histogram", "", f"{name}_bucket{_labels(file=file, le='+Inf')} {histogram['count']}")
+        add(name, "histogram", "", f"{name}_sum{_labels(file=file)} {histogram['sum']:.4f}")
+        add(name, "histogram", "", f"{name}_count{_labels(file=file)} {histogram['count']}")
+
+        last_run = file_state.get("last_run") or {}
+        if last_run.get("timestamp") is not None:
+            add(f"{prefix}_last_run_timestamp_seconds", "gauge", "Время завершения последнего импорта.",
+                f"{prefix}_last_run_timestamp_seconds{_labels(file=file)} {last_run['timestamp']:.0f}")
+        if file_state.get("last_success") is not None:
+            add(f"{prefix}_last_success_timestamp_seconds", "gauge", "Время последнего успешного импорта.",
+                f"{prefix}_last_success_timestamp_seconds{_labels(file=file)} {file_state['last_success']:.0f}")
+        if last_run:
+            add(f"{prefix}_last_run_success", "gauge", "1, если последний импорт успешен.",
+                f"{prefix}_last_run_success{_labels(file=file)} {int(last_run['status'] in SUCCESS_STATUSES)}")
+            for name, value in sorted(last_run["rows"].items()):
+                add(f"{prefix}_last_run_rows", "gauge", "Счетчики строк последнего импорта.",
+                    f"{prefix}_last_run_rows{_labels(file=file, metric=name)} {value}")
+            for name, value in sorted(last_run.get("values", {}).items()):
+                add(f"{prefix}_last_run_value", "gauge", "Прочие целые метрики последнего импорта (признаки, пачки).",
+                    f"{prefix}_last_run_value{_labels(file=file, metric=name)} {value}")
+            add(f"{prefix}_last_run_row_errors", "gauge", "Ошибки строк последнего импорта.",
+                f"{prefix}_last_run_row_errors{_labels(file=file)} {last_run['row_errors']}")
+            for phase, duration in sorted(last_run["phases"].items()):
+                add(f"{prefix}_last_run_phase_seconds", "gauge", "Длительность фаз последнего импорта.",
+                    f"{prefix}_last_run_phase_seconds{_labels(file=file, phase=phase)} {duration}")
+            add(f"{prefix}_last_run_file_bytes", "gauge", "Размер последнего разобранного файла.",
+                f"{prefix}_last_run_file_bytes{_labels(file=file)} {last_run['file_bytes']}")
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+def export_metrics(
+        entries: list[dict[str, Any]],
+        textfile_dir: Path | None = METRICS_TEXTFILE_DIR,
+        state_path: Path = METRICS_STATE_FILE,
+    ) -> None:
+    """
+    Добавляет отчеты к накопленному состоянию (state_path) и атомарно
+    переписывает файл метрик для textfile collector node_exporter.
+    Без textfile_dir (METRICS_TEXTFILE_DIR не задан) ничего не делает.
+    """
+    if textfile_dir is None:
+        return
+    try:
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(state_path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state: dict[str, Any] = {}
+            if state_path.exists():
+                try:
+                    with open(state_path, "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                except (json.JSONDecodeError, OSError) as e:
+                    logger.warning(f"Состояние метрик повреждено и будет пересоздано: {e}")
+
+            for entry in entries:
+                _update_state(state, entry)
+
+            _write_atomic(state_path, json.dumps(state, ensure_ascii=False))
+            _write_atomic(textfile_dir / METRICS_FILE_NAME, render_metrics(state))
+    except OSError as e:
+        logger.error(f"Не удалось сохранить метрики Prometheus: {e}")
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+import argparse
+
+from mariadb import Error as mariadb_error
+
+from importer.config import (
+    REPORT_DIR,
+    REPORT_FILE_NAME,
+    SQL_CONFIG,
+    STOCKS_LOG_PURGE_BATCH,
+    STOCKS_LOG_PURGE_PAUSE_SEC,
+    STOCKS_LOG_RETENTION_DAYS,
+    TABLE_STOCK_PRICES,
+)
+from importer.db import ConnectionPool
+from importer.logger import logger
+from importer.report import ImportReport, save_reports
+from importer.sql_files import load_sql
+from importer.timings import Timings
+
+
+# Имя задачи в report.json (поле file).
+PURGE_REPORT_NAME = "shop_product_stocks_log"
+
+
+def purge_stocks_log(
+        conn,
+        timings: Timings,
+        retention_days: int = STOCKS_LOG_RETENTION_DAYS,
+        batch_size: int = STOCKS_LOG_PURGE_BATCH,
+        pause_sec: float = STOCKS_LOG_PURGE_PAUSE_SEC,
+        max_duration_sec: float | None = None,
+    ) -> dict[str, int]:
+    """
+    Удаляет записи shop_product_stocks_log старше retention_days.
+    Граница по id определяется один раз, затем записи удаляются диапазонами
+    первичного ключа не больше batch_size строк, каждый диапазон - отдельной
+    транзакцией с паузой pause_sec. При max_duration_sec очистка прерывается
+    по истечении времени (оставшееся удалит следующий запуск).
+    """
+    cfg = SQL_CONFIG[TABLE_STOCK_PRICES]
+    cursor = conn.cursor()
+    started = time.monotonic()
+    stats = {"rows_purged": 0, "batches": 0, "completed": 0}
+
+    try:
+        cursor.execute("SELECT DATE_SUB(NOW(), INTERVAL %s DAY)", (retention_days,))
+        cutoff = cursor.fetchone()[0]
+        with timings.span("sql.purge_logs_bounds"):
+            cursor.execute(load_sql(cfg["purge_logs_bounds"]), (cutoff,))
+            min_id, max_id = cursor.fetchone()
+        conn.commit()
+
+        if max_id is None:
+            logger.info(f"Нет записей shop_product_stocks_log старше {cutoff}.")
+            stats["completed"] = 1
+            return stats
+
+        logger.info(f"Очистка shop_product_stocks_log: записи старше {cutoff}, id {min_id}-{max_id}")
+        last_id = min_id - 1
+        while True:
+            cursor.execute(load_sql(cfg["purge_logs_batch_end"]), (last_id, max_id, batch_size))
+            batch_end = cursor.fetchone()[0]
+            if batch_end is None:
+                stats["completed"] = 1
+                break
+            if max_duration_sec is not None and time.monotonic() - started >= max_duration_sec:
+                logger.info(f"Очистка прервана по времени ({max_duration_sec} с), продолжится при следующем запуске.")
+                break
+            if stats["batches"]:
+                time.sleep(pause_sec)
+
+            with timings.span("sql.purge_logs_delete") as span:
+                cursor.execute(load_sql(cfg["purge_logs_delete"]), (last_id, batch_end, cutoff))
+                span.rows = max(cursor.rowcount, 0)
+                conn.commit()
+            stats["rows_purged"] += span.rows
+            stats["batches"] += 1
+            last_id = batch_end
+
+        return stats
+
+    except mariadb_error as e:
+        conn.rollback()
+        logger.error(f"Ошибка БД MariaDB при очистке лога (Code: {e.errno}): {e}")
+        raise
+    finally:
+        cursor.close()
+
+def run_purge(pool: ConnectionPool, max_duration_sec: float | None = None, **kwargs) -> ImportReport:
+    """
+    Выполняет очистку с отчетом (rows_purged, batches, completed, длительность)
+    и добавляет его в report.json.
+    """
+    report = ImportReport(PURGE_REPORT_NAME)
+    try:
+        with report.timings.span("total") as total_span, pool.connection() as conn:
+            stats = purge_stocks_log(conn, report.timings, max_duration_sec=max_duration_sec, **kwargs)
+            total_span.rows = stats["rows_purged"]
+        report.set_metrics(stats)
+        report.set_success()
+        logger.success(
+            f"Очистка shop_product_stocks_log завершена: удалено={stats['rows_purged']}, "
+            f"пачек={stats['batches']}"
+        )
+    except Exception as e:
+        logger.exception(f"Ошибка очистки shop_product_stocks_log: {e}")
+        report.set_failed(e)
+
+    save_reports([report], REPORT_DIR / REPORT_FILE_NAME)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Очистка shop_product_stocks_log пачками.")
+    parser.add_argument("--days", type=int, default=STOCKS_LOG_RETENTION_DAYS, help="Срок хранения, дней.")
+    parser.add_argument("--batch", type=int, default=STOCKS_LOG_PURGE_BATCH, help="Строк в пачке.")
+    parser.add_argument("--pause-ms", type=int, default=int(STOCKS_LOG_PURGE_PAUSE_SEC * 1000), help="Пауза, мс.")
+    parser.add_argument("--max-sec", type=float, help="Ограничение длительности, сек.")
+    args = parser.parse_args()
+
+    pool = ConnectionPool()
+    try:
+        report = run_purge(
+            pool,
+            max_duration_sec=args.max_sec,
+            retention_days=args.days,
+            batch_size=max(1, args.batch),
+            pause_sec=args.pause_ms / 1000,
+        )
+    finally:
+        pool.close()
+    if report.status == "failed":
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
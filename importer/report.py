@@ -1,14 +1,154 @@
 from __future__ import annotations
 
 import json
+import time
 import traceback
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO
 
+from importer.config import (
+    REPORT_HISTORY_DAYS,
+    ROW_ERRORS_DIR,
+    ROW_ERRORS_GROUP_LINES,
+    ROW_ERRORS_LOG_FIRST,
+    ROW_ERRORS_LOG_INTERVAL_SEC,
+    ROW_ERRORS_SAMPLE,
+    ROW_ERRORS_SPILL,
+)
 from importer.logger import logger
+from importer.prometheus import export_metrics
+from importer.report_store import ReportStore
+from importer.timings import Timings
 
 
+class RowErrorCollector:
+    """
+    Ошибки строк одного файла: группы по (тип, поле) со счетчиком, первым
+    сообщением и номерами первых строк, выборка первых sample_size ошибок
+    и логирование с ограничением частоты. Если задан spill_dir, полный
+    список пишется в JSONL-файл.
+    """
+    def __init__(
+            self,
+            file_name: str,
+            sample_size: int = ROW_ERRORS_SAMPLE,
+            group_lines: int = ROW_ERRORS_GROUP_LINES,
+            log_first: int = ROW_ERRORS_LOG_FIRST,
+            log_interval_sec: float = ROW_ERRORS_LOG_INTERVAL_SEC,
+            spill_dir: Path | None = ROW_ERRORS_DIR if ROW_ERRORS_SPILL else None,
+        ):
+        self.file_name = file_name
+        self.sample_size = sample_size
+        self.group_lines = group_lines
+        self.log_first = log_first
+        self.log_interval_sec = log_interval_sec
+        self.spill_dir = spill_dir
+        self.spill_path: Path | None = None
+        self.total = 0
+        self.sample: list[dict[str, Any]] = []
+        self.groups: dict[tuple[str, str | None], dict[str, Any]] = {}
+        self._spill: TextIO | None = None
+        self._suppressed = 0
+        self._last_log = time.monotonic()
+        self._closed = False
+
+    def add(self, line_number: int, message: str, kind: str, field: str | None) -> None:
+        self.total += 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append({"line": line_number, "message": message})
+
+        group = self.groups.get((kind, field))
+        if group is None:
+            group = {"type": kind, "field": field, "count": 0, "message": message, "lines": []}
+            self.groups[(kind, field)] = group
+        group["count"] += 1
+        if len(group["lines"]) < self.group_lines:
+            group["lines"].append(line_number)
+
+        if self.spill_dir is not None:
+            self._spill_write(line_number, message, kind, field)
+        self._log(line_number, message)
+
+    def _log(self, line_number: int, message: str) -> None:
+        if self.total <= self.log_first:
+            logger.warning(f"Ошибка в строке {line_number} файла {self.file_name}: {message}")
+            return
+        self._suppressed += 1
+        now = time.monotonic()
+        if now - self._last_log >= self.log_interval_sec:
+            self._log_suppressed(f"последняя в строке {line_number}: {message}")
+            self._last_log = now
+
+    def _log_suppressed(self, detail: str) -> None:
+        logger.warning(
+            f"Файл {self.file_name}: еще {self._suppressed} ошибок строк (всего {self.total}), {detail}"
+        )
+        self._suppressed = 0
+
+    def _spill_write(self, line_number: int, message: str, kind: str, field: str | None) -> None:
+        try:
+            if self._spill is None:
+                self._spill = self._open_spill()
+            entry = {"line": line_number, "type": kind, "field": field, "message": message}
+            self._spill.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"Не удалось записать ошибки строк в файл: {e}")
+            self.spill_dir = None
+
+    def _open_spill(self) -> TextIO:
+        """Создает файл ошибок и удаляет файлы старше REPORT_HISTORY_DAYS."""
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        cutoff = time.time() - REPORT_HISTORY_DAYS * 86400
+        for old_path in self.spill_dir.glob("*.jsonl"):
+            if old_path.stat().st_mtime < cutoff:
+                old_path.unlink(missing_ok=True)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.spill_path = self.spill_dir / f"{self.file_name}.{stamp}.jsonl"
+        return open(self.spill_path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        """
+        Дописывает в лог подавленные сообщения и сводку по группам, закрывает
+        файл ошибок. Повторный вызов ничего не делает.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._suppressed:
+            self._log_suppressed("сообщения подавлены")
+        if self.total > self.log_first:
+            for group in self.groups.values():
+                logger.warning(
+                    f"Файл {self.file_name}: {group['count']} ошибок типа {group['type']} "
+                    f"(поле {group['field']}), например: {group['message']}"
+                )
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            logger.info(f"Полный список ошибок строк: {self.spill_path}")
+
+    def restore(self, data: dict[str, Any]) -> None:
+        """
+        Восстанавливает ошибки из результата to_dict() без повторного
+        логирования (повторный импорт из спула строк): сводку уже записал
+        в лог исходный импорт, поэтому close() ее не повторяет.
+        """
+        self._closed = True
+        self.total = data.get("row_errors_total", 0)
+        self.sample = list(data.get("row_errors", []))
+        self.groups = {(group["type"], group["field"]): group for group in data.get("row_error_groups", [])}
+        if data.get("row_errors_file"):
+            self.spill_path = Path(data["row_errors_file"])
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "row_errors": self.sample,
+            "row_errors_total": self.total,
+            "row_error_groups": list(self.groups.values()),
+            "row_errors_file": str(self.spill_path) if self.spill_path else None,
+        }
+
 class ImportReport:
     """
     Класс для формирования и сохранения отчета о работе импортера.
@@ -21,8 +161,11 @@ class ImportReport:
         self.finished_at: str | None = None
         self.products_parsed = 0
         self.metrics: dict[str, int] = {}
-        self.row_errors: list[dict[str, Any]] = []
+        self.row_errors = RowErrorCollector(file_name)
         self.error: dict[str, Any] | None = None
+        self.content_hash: str | None = None
+        self.timings = Timings()
+        self.converter_cache: dict[str, list[int]] = {}
 
     def set_products_parsed(self, count: int):
         """Устанавливает количество распарсенных товаров."""
@@ -36,16 +179,29 @@ class ImportReport:
         """Устанавливает дату обновления из XML файла."""
         self.info_update_date = date_str
 
-    def add_row_error(self, line_number: int, message: str) -> None:
+    def set_content_hash(self, content_hash: str | None) -> None:
+        """Устанавливает SHA-256 содержимого файла."""
+        self.content_hash = content_hash
+
+    def add_converter_cache_stats(self, stats: dict[str, tuple[int, int]]) -> None:
+        """Добавляет попадания и промахи кэшей конвертеров значений."""
+        for name, (hits, misses) in stats.items():
+            counters = self.converter_cache.setdefault(name, [0, 0])
+            counters[0] += hits
+            counters[1] += misses
+
+    def _converter_cache_dict(self) -> dict[str, dict[str, Any]]:
+        result = {}
+        for name, (hits, misses) in self.converter_cache.items():
+            if hits + misses:
+                result[name] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4)}
+        return result
+
+    def add_row_error(self, line_number: int, message: str, kind: str, field: str | None = None) -> None:
         """
         Добавляет информацию об ошибке в конкретной строке.
         """
-        error_entry = {
-            "line": line_number,
-            "message": message
-        }
-        self.row_errors.append(error_entry)
-        logger.warning(f"Ошибка в строке {line_number} файла {self.file_name}: {message}")
+        self.row_errors.add(line_number, message, kind, field)
 
     def set_success(self) -> None:
         """
@@ -53,15 +209,25 @@ class ImportReport:
         """
         self.status = "success"
         self.finished_at = self._get_current_time_iso()
-        if self.row_errors:
+        self.row_errors.close()
+        if self.row_errors.total:
             self.status = "completed_with_errors"
 
+    def set_skipped(self) -> None:
+        """
+        Фиксирует пропуск файла, совпадающего с последним примененным.
+        """
+        self.status = "skipped"
+        self.finished_at = self._get_current_time_iso()
+        self.row_errors.close()
+
     def set_failed(self, exc: Exception) -> None:
         """
         Фиксирует ошибку и сохраняет traceback.
         """
         self.status = "failed"
         self.finished_at = self._get_current_time_iso()
+        self.row_errors.close()
         self.error = {
             "type": type(exc).__name__,
             "message": str(exc),
@@ -77,8 +243,11 @@ class ImportReport:
             "finished_at": self.finished_at,
             "products_parsed": self.products_parsed,
             "metrics": self.metrics,
-            "row_errors": self.row_errors,
-            "error": self.error
+            **self.row_errors.to_dict(),
+            "error": self.error,
+            "content_hash": self.content_hash,
+            "timings": self.timings.to_dict(),
+            "converter_cache": self._converter_cache_dict(),
         }
 
     def _get_current_time_iso(self) -> str:
@@ -88,35 +257,17 @@ class ImportReport:
         tz_plus_3 = timezone(timedelta(hours=3))
         return datetime.now(tz_plus_3).replace(microsecond=0).isoformat()
 
-def load_existing_reports(report_path: Path) -> list[dict]:
-    """Загружает существующие отчеты, если файл существует."""
-    if not report_path.exists():
-        return []
+def save_reports(reports: list[ImportReport], report_path: Path) -> None:
+    """
+    Добавляет отчеты в хранилище истории, обновляет сводку report_path
+    за последние REPORT_SUMMARY_HOURS часов и метрики Prometheus.
+    """
+    entries = [report.to_dict() for report in reports]
     try:
-        with open(report_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
-        return []
-
-def filter_reports_by_retention(reports: list[dict], hours: int = 24) -> list[dict]:
-    """Оставляет отчеты только за последние N часов (или сутки)."""
-    cutoff_time = datetime.now().astimezone() - timedelta(hours=hours)
-    valid_reports = []
-
-    for rep in reports:
-        try:
-            finished_at_str = rep.get("finished_at")
-            if not finished_at_str:
-                continue
-
-            rep_time = datetime.fromisoformat(finished_at_str)
-
-            if rep_time.tzinfo is None:
-                 rep_time = rep_time.astimezone()
-
-            if rep_time > cutoff_time:
-                valid_reports.append(rep)
-        except ValueError:
-            continue
-
-    return valid_reports
+        store = ReportStore()
+        store.append(entries)
+        store.write_summary(report_path)
+        logger.info(f"Отчет сохранен: {report_path}")
+    except Exception as e:
+        logger.exception(f"Ошибка при сохранении отчета: {e}")
+    export_metrics(entries)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+import json
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from importer.config import (
+    REPORT_DIR,
+    REPORT_FILE_NAME,
+    REPORT_HISTORY_DAYS,
+    REPORT_STORE_FILE,
+    REPORT_SUMMARY_HOURS,
+    REPORT_SUMMARY_ROW_ERRORS,
+)
+from importer.logger import logger
+
+
+# Ожидание блокировки SQLite при одновременной записи (импорт и очистка лога).
+STORE_BUSY_TIMEOUT_SEC = 30
+
+
+def _finished_ts(entry: dict[str, Any]) -> float | None:
+    """Время завершения отчета (Unix time) или None, если его нет."""
+    finished_at = entry.get("finished_at") or entry.get("started_at")
+    if not finished_at:
+        return None
+    try:
+        finished = datetime.fromisoformat(finished_at)
+    except (TypeError, ValueError):
+        return None
+    if finished.tzinfo is None:
+        finished = finished.astimezone()
+    return finished.timestamp()
+
+def load_existing_reports(report_path: Path) -> list[dict]:
+    """Загружает существующие отчеты, если файл существует."""
+    if not report_path.exists():
+        return []
+    try:
+        with open(report_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return []
+
+def compact_report(entry: dict[str, Any], row_errors_limit: int = REPORT_SUMMARY_ROW_ERRORS) -> dict[str, Any]:
+    """
+    Запись для report.json: не больше row_errors_limit ошибок строк
+    и их общее число в row_errors_total. Полный отчет остается в хранилище.
+    """
+    row_errors = entry.get("row_errors") or []
+    if len(row_errors) <= row_errors_limit:
+        return entry
+    total = entry.get("row_errors_total") or len(row_errors)
+    return {**entry, "row_errors": row_errors[:row_errors_limit], "row_errors_total": total}
+
+class ReportStore:
+    """
+    История отчетов в SQLite (REPORT_STORE_FILE): одна строка на отчет
+    с индексами по файлу и времени завершения. Добавление и очистка
+    старых записей не требуют чтения всей истории; report.json
+    для nginx формируется из последних записей и заменяется атомарно.
+    """
+    def __init__(self, path: Path = REPORT_STORE_FILE):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists()
+        conn = sqlite3.connect(str(self.path), timeout=STORE_BUSY_TIMEOUT_SEC)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "id INTEGER PRIMARY KEY, file TEXT NOT NULL, status TEXT, "
+            "finished_ts REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_finished ON reports (finished_ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_file ON reports (file, finished_ts)")
+        if is_new:
+            self._migrate_report_json(conn, REPORT_DIR / REPORT_FILE_NAME)
+        return conn
+
+    def _migrate_report_json(self, conn: sqlite3.Connection, report_path: Path) -> None:
+        """Переносит историю из report.json прежнего формата при создании хранилища."""
+        entries = load_existing_reports(report_path)
+        if entries:
+            count = self._insert(conn, entries)
+            conn.commit()
+            logger.info(f"История отчетов перенесена из {report_path}: записей={count}")
+
+    def _insert(self, conn: sqlite3.Connection, entries: list[dict[str, Any]]) -> int:
+        rows = []
+        for entry in entries:
+            finished_ts = _finished_ts(entry)
+            if finished_ts is None:
+                continue
+            rows.append((
+                entry.get("file", ""),
+                entry.get("status"),
+                finished_ts,
+                json.dumps(entry, ensure_ascii=False, separators=(",", ":")),
+            ))
+        conn.executemany("INSERT INTO reports (file, status, finished_ts, data) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def append(self, entries: list[dict[str, Any]], history_days: int = REPORT_HISTORY_DAYS) -> None:
+        """Добавляет отчеты и удаляет записи старше history_days дней."""
+        cutoff = (datetime.now().astimezone() - timedelta(days=history_days)).timestamp()
+        conn = self._connect()
+        try:
+            self._insert(conn, entries)
+            conn.execute("DELETE FROM reports WHERE finished_ts < ?", (cutoff,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def recent(self, hours: int = REPORT_SUMMARY_HOURS, file: str | None = None) -> list[dict[str, Any]]:
+        """Отчеты за последние hours часов (по возрастанию времени), опционально по одному файлу."""
+        cutoff = (datetime.now().astimezone() - timedelta(hours=hours)).timestamp()
+        query = "SELECT data FROM reports WHERE finished_ts > ?"
+        params: tuple[Any, ...] = (cutoff,)
+        if file is not None:
+            query += " AND file = ?"
+            params += (file,)
+        conn = self._connect()
+        try:
+            rows = conn.execute(query + " ORDER BY finished_ts, id", params).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(data) for (data,) in rows]
+
+    def write_summary(self, report_path: Path, hours: int = REPORT_SUMMARY_HOURS) -> None:
+        """
+        Атомарно заменяет report_path сводкой за последние hours часов
+        (временный файл в том же каталоге + os.replace).
+        """
+        summary = [compact_report(entry) for entry in self.recent(hours)]
+        tmp_path = report_path.with_name(f".{report_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, report_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Просмотр истории отчетов импорта.")
+    parser.add_argument("--file", help="Только отчеты по файлу (например, stock_prices.xml).")
+    parser.add_argument("--hours", type=int, default=REPORT_SUMMARY_HOURS, help="Глубина истории, часов.")
+    args = parser.parse_args()
+
+    entries = ReportStore().recent(args.hours, args.file)
+    print(json.dumps(entries, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import re
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from importer.checkpoint import RowSpool
+from importer.config import (
+    FAILED_DIR,
+    FILE_PROD_DOP,
+    FILE_WAREHOUSES,
+    REPORT_DIR,
+    REPORT_FILE_NAME,
+    SQL_CONFIG,
+    TABLE_PROD_DROP,
+    TABLE_WAREHOUSES,
+)
+from importer.db import ConnectionPool
+from importer.logger import logger
+from importer.main import IMPORTERS, failed_status_path, import_file, read_failed_status, write_failed_status
+from importer.manifest import HashManifest
+from importer.report import ImportReport, save_reports
+from importer.sync import sync_data
+from importer.xml_utils import get_xml_files
+
+
+# Имя файла в FAILED_DIR: <имя>_<DATE_FORMAT_LOG><.xml[.gz|.xz|.zst]>.
+FAILED_NAME = re.compile(r"^(?P<stem>.+)_(?P<timestamp>\d{8}_\d{6})(?P<extension>\.xml(?:\.gz|\.xz|\.zst)?)$")
+# Типы файлов, импорт которых пишет спул строк (CHECKPOINT_SPOOL).
+SPOOL_TABLES = {
+    FILE_PROD_DOP: TABLE_PROD_DROP,
+    FILE_WAREHOUSES: TABLE_WAREHOUSES,
+}
+# Статусы, при которых файл без спула импортируется повторно. Файл со статусом
+# completed_with_errors уже синхронизирован: повтор дал бы те же ошибки строк.
+REPROCESS_STATUSES = ("failed", "pending")
+
+
+def failed_file_type(file_path: Path) -> str | None:
+    """Тип файла из имени в FAILED_DIR (warehouses_20260101_120000.xml.gz -> warehouses.xml)."""
+    match = FAILED_NAME.match(file_path.name)
+    if match is None:
+        return None
+    return f"{match.group('stem')}.xml"
+
+def latest_failed_files(failed_dir: Path = FAILED_DIR) -> dict[str, list[Path]]:
+    """
+    Файлы FAILED_DIR известных типов, сгруппированные по типу,
+    от новых к старым (по времени в имени).
+    """
+    groups: dict[str, list[Path]] = {}
+    for file_path in get_xml_files(failed_dir):
+        file_type = failed_file_type(file_path)
+        if file_type in IMPORTERS:
+            groups.setdefault(file_type, []).append(file_path)
+    for files in groups.values():
+        files.sort(key=lambda path: FAILED_NAME.match(path.name).group("timestamp"), reverse=True)
+    return groups
+
+def replay_spool(
+        file_path: Path,
+        spool: RowSpool,
+        file_type: str,
+        pool: ConnectionPool,
+        manifest: HashManifest,
+    ) -> ImportReport:
+    """
+    Повторяет синхронизацию из спула без разбора XML. Ошибки строк исходного
+    разбора переносятся в отчет, поэтому статус совпадает с полным импортом.
+    После синхронизации спул удаляется; при статусе success удаляется и файл,
+    а его хэш записывается в манифест, иначе файл остается в failed.
+    """
+    report = ImportReport(file_type)
+    try:
+        logger.info(f"Повторный импорт из спула: '{file_path.name}'")
+        spool.read_header()
+
+        with report.timings.span("total") as total_span, pool.connection() as conn:
+            total_span.bytes = file_path.stat().st_size
+            sync_results = sync_data(
+                conn,
+                rows=report.timings.measure_iter("spool", spool.rows()),
+                is_delete=lambda: spool.footer["header"]["is_delete"],
+                timings=report.timings,
+                cfg=SQL_CONFIG[SPOOL_TABLES[file_type]],
+            )
+
+        if spool.footer["header"].get("info_update_date"):
+            report.set_info_update_date(spool.footer["header"]["info_update_date"])
+        report.set_products_parsed(sync_results["rows_parsed"])
+        report.set_content_hash(spool.footer.get("content_hash"))
+        report.set_metrics({
+            "db_inserted": sync_results["db_inserted"],
+            "db_updated": sync_results["db_updated"],
+            "db_deleted": sync_results["db_deleted"],
+            "rows_unchanged": sync_results["rows_unchanged"],
+            "from_spool": 1,
+        })
+        report.row_errors.restore(spool.footer.get("row_errors", {}))
+        report.set_success()
+        spool.discard()
+
+        if report.status != "success":
+            write_failed_status(file_path, report.status)
+            logger.warning(f"Файл '{file_path.name}' синхронизирован из спула с ошибками ({report.status}).")
+            return report
+        if report.content_hash:
+            manifest.record(file_type, file_path, report.content_hash)
+        file_path.unlink()
+        failed_status_path(file_path).unlink(missing_ok=True)
+        logger.success(f"Файл '{file_path.name}' синхронизирован из спула и удален.")
+    except Exception as e:
+        logger.exception(f"Ошибка повторного импорта из спула '{file_path.name}': {e}")
+        report.set_failed(e)
+    return report
+
+def reprocess_failed(pool: ConnectionPool, force: bool = False, dry_run: bool = False) -> list[ImportReport]:
+    """
+    Повторяет импорт последнего файла каждого типа из FAILED_DIR: из спула,
+    если он есть, иначе полным импортом, если импорт файла упал (статус
+    failed/pending или не записан). Файл пропускается, если после его
+    загрузки успешно применен более новый файл этого типа (кроме force).
+    Более старые файлы того же типа не повторяются.
+    """
+    manifest = HashManifest()
+    reports: list[ImportReport] = []
+
+    for file_type, files in latest_failed_files().items():
+        file_path, stale = files[0], files[1:]
+        if stale:
+            logger.info(f"Пропущены устаревшие файлы {file_type}: {', '.join(path.name for path in stale)}")
+
+        applied_at = manifest.last_applied_at(file_type)
+        uploaded_at = datetime.fromtimestamp(file_path.stat().st_mtime).astimezone()
+        if not force and applied_at is not None and applied_at > uploaded_at:
+            logger.info(f"Файл '{file_path.name}' устарел: {file_type} применен позже ({applied_at.isoformat()}).")
+            continue
+
+        spool = RowSpool.beside(file_path)
+        use_spool = file_type in SPOOL_TABLES and spool.exists()
+        status = read_failed_status(file_path)
+        if not use_spool and status is not None and status not in REPROCESS_STATUSES:
+            logger.info(f"Файл '{file_path.name}' уже синхронизирован (статус {status}), повтор не нужен.")
+            continue
+        logger.info(f"К повтору: '{file_path.name}' ({'спул' if use_spool else 'полный импорт'})")
+        if dry_run:
+            continue
+
+        if use_spool:
+            reports.append(replay_spool(file_path, spool, file_type, pool, manifest))
+        else:
+            # import_file удалит файл или переместит его под новым именем со своим статусом.
+            failed_status_path(file_path).unlink(missing_ok=True)
+            report = import_file(file_path, pool, manifest, file_type=file_type)
+            if report is not None:
+                reports.append(report)
+
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторный импорт файлов из reports/failed.")
+    parser.add_argument("--force", action="store_true", help="Повторять и устаревшие файлы.")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет повторено.")
+    args = parser.parse_args()
+
+    pool = ConnectionPool()
+    try:
+        if not args.dry_run and not pool.check():
+            logger.critical("Нет связи с БД. Повторный импорт остановлен.")
+            raise SystemExit(1)
+        reports = reprocess_failed(pool, force=args.force, dry_run=args.dry_run)
+    finally:
+        pool.close()
+
+    if reports:
+        save_reports(reports, REPORT_DIR / REPORT_FILE_NAME)
+    if any(report.status == "failed" for report in reports):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
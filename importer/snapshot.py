@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+from importer.config import DELTA_SNAPSHOT_MAX_AGE, SNAPSHOT_DIR
+from importer.logger import logger
+
+
+KEY_SEPARATOR = "\x1f"
+ROW_HASH_SIZE = 8
+
+
+def row_key(row: Sequence[Any], key_size: int) -> str:
+    """Ключ строки: первые key_size колонок."""
+    return KEY_SEPARATOR.join(str(value) for value in row[:key_size])
+
+def row_hash(row: Sequence[Any], key_size: int) -> bytes:
+    """
+    Компактный хэш неключевых колонок строки. Значения приводятся к str,
+    поэтому Decimal/date и их строковая форма (параллельный разбор) совпадают.
+    """
+    data = KEY_SEPARATOR.join(str(value) for value in row[key_size:]).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=ROW_HASH_SIZE).digest()
+
+class DeltaSnapshot:
+    """
+    Локальный снимок последнего примененного состояния таблицы:
+    SQLite-файл в SNAPSHOT_DIR с отображением ключ -> хэш строки
+    и метаданными (число строк, контрольная сумма таблицы в БД, время применения).
+    """
+    def __init__(self, table: str, snapshot_dir: Path = SNAPSHOT_DIR):
+        self.table = table
+        self.path = snapshot_dir / f"{table}.sqlite3"
+
+    def load_if_fresh(self, db_row_count: int, db_checksum: int) -> dict[str, bytes] | None:
+        """
+        Возвращает снимок, если он есть, не старше DELTA_SNAPSHOT_MAX_AGE,
+        а число строк и контрольная сумма колонок таблицы в БД совпадают
+        с записанными при сохранении. Иначе None (полный режим).
+        """
+        if not self.path.exists():
+            logger.info(f"Снимок {self.table} отсутствует, полная синхронизация.")
+            return None
+        try:
+            conn = sqlite3.connect(str(self.path))
+            try:
+                meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+                applied_at = datetime.fromisoformat(meta["applied_at"])
+                if datetime.now().astimezone() - applied_at > DELTA_SNAPSHOT_MAX_AGE:
+                    logger.info(f"Снимок {self.table} устарел ({meta['applied_at']}), полная синхронизация.")
+                    return None
+                if int(meta["row_count"]) != db_row_count:
+                    logger.info(
+                        f"Снимок {self.table} не совпадает с БД "
+                        f"(строк {meta['row_count']} против {db_row_count}), полная синхронизация."
+                    )
+                    return None
+                if meta.get("db_checksum") is None or int(meta["db_checksum"]) != db_checksum:
+                    logger.info(
+                        f"Снимок {self.table} не совпадает с БД (контрольная сумма), полная синхронизация."
+                    )
+                    return None
+                return dict(conn.execute("SELECT key, hash FROM rows_state").fetchall())
+            finally:
+                conn.close()
+        except (sqlite3.Error, KeyError, ValueError) as e:
+            logger.warning(f"Снимок {self.table} поврежден ({e}), полная синхронизация.")
+            return None
+
+    def invalidate(self) -> None:
+        """Удаляет снимок (перед фиксацией транзакции в БД)."""
+        self.path.unlink(missing_ok=True)
+
+    def save(self, state: dict[str, bytes], db_checksum: int) -> None:
+        """
+        Атомарно сохраняет новое состояние (временный файл + os.replace)
+        вместе с контрольной суммой таблицы в БД на момент фиксации.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.unlink(missing_ok=True)
+
+        try:
+            conn = sqlite3.connect(str(tmp_path))
+            try:
+                conn.execute("CREATE TABLE rows_state (key TEXT PRIMARY KEY, hash BLOB NOT NULL) WITHOUT ROWID")
+                conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                conn.executemany("INSERT INTO rows_state (key, hash) VALUES (?, ?)", state.items())
+                conn.executemany(
+                    "INSERT INTO meta (name, value) VALUES (?, ?)",
+                    [
+                        ("row_count", str(len(state))),
+                        ("db_checksum", str(db_checksum)),
+                        ("applied_at", datetime.now().astimezone().isoformat()),
+                    ],
+                )
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(tmp_path, self.path)
+            logger.info(f"Снимок {self.table} сохранен: строк={len(state)}")
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Не удалось сохранить снимок {self.table}: {e}")
+
+class DeltaTracker:
+    """
+    Сравнивает поток строк со снимком. В режиме дельты (base задан) пропускает
+    дальше только новые и измененные строки; в полном режиме пропускает все.
+    В обоих режимах собирает состояние файла для следующего снимка.
+    """
+    def __init__(self, key_size: int, base: dict[str, bytes] | None):
+        self.key_size = key_size
+        self.base = base
+        self.state: dict[str, bytes] = {}
+        self.rows_parsed = 0
+        self.rows_unchanged = 0
+
+    @property
+    def is_delta(self) -> bool:
+        return self.base is not None
+
+    def track(self, rows: Iterable[Sequence[Any]]) -> Iterator[Sequence[Any]]:
+        for row in rows:
+            key = row_key(row, self.key_size)
+            digest = row_hash(row, self.key_size)
+            self.state[key] = digest
+            self.rows_parsed += 1
+            if self.base is not None and self.base.get(key) == digest:
+                self.rows_unchanged += 1
+                continue
+            yield row
+
+    def deleted_keys(self) -> list[tuple[str, ...]]:
+        """Ключи из снимка, отсутствующие в файле (только в режиме дельты)."""
+        if self.base is None:
+            return []
+        return [tuple(key.split(KEY_SEPARATOR)) for key in self.base.keys() - self.state.keys()]
+
+    def next_state(self, is_delete: bool) -> dict[str, bytes] | None:
+        """
+        Состояние таблицы после применения файла или None, если оно неизвестно
+        (полный режим без удаления: в таблице могут остаться строки не из файла).
+        """
+        if is_delete:
+            return self.state
+        if self.base is None:
+            return None
+        return {**self.base, **self.state}
@@ -0,0 +1,3 @@
+DELETE t
+FROM tbl_prod_dop t
+JOIN tmp_tbl_prod_dop_deleted d ON d.id_1c = t.id_1c;
@@ -0,0 +1,4 @@
+CREATE TEMPORARY TABLE tmp_tbl_prod_dop_deleted (
+    id_1c VARCHAR(36) NOT NULL,
+    PRIMARY KEY (id_1c)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
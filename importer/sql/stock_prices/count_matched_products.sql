@@ -0,0 +1,5 @@
+-- Товары магазина, найденные по product_id_1c из файла (строки, которые сопоставляет
+-- update_shop_product.sql, включая не потребовавшие изменений).
+SELECT COUNT(DISTINCT p.id)
+FROM shop_product p
+JOIN tmp_stock_prices_products t ON t.product_id_1c = p.id_1c;
@@ -0,0 +1,6 @@
+-- Артикулы, найденные по product_id_1c из файла (строки, которые сопоставляет
+-- update_shop_product_skus.sql, включая не потребовавшие изменений).
+SELECT COUNT(DISTINCT s.id)
+FROM shop_product_skus s
+JOIN tmp_stock_prices_products t ON t.product_id_1c = s.id_1c
+JOIN shop_product p ON p.id = s.product_id;
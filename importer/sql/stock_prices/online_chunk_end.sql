@@ -0,0 +1,10 @@
+-- Последний product_id_1c следующего диапазона: первые N товаров после предыдущего диапазона.
+-- NULL - все товары применены.
+SELECT MAX(product_id_1c)
+FROM (
+    SELECT product_id_1c
+    FROM tmp_stock_prices_products_all
+    WHERE product_id_1c > %s
+    ORDER BY product_id_1c
+    LIMIT %s
+) chunk;
@@ -0,0 +1,7 @@
+-- delete_stocks_for_missing_products.sql для диапазона shop_product.id (онлайн-режим).
+DELETE ps
+FROM shop_product_stocks ps
+JOIN shop_product p ON p.id = ps.product_id
+LEFT JOIN tmp_stock_prices_products tp ON tp.product_id_1c = p.id_1c
+WHERE p.id > %s AND p.id <= %s
+  AND tp.product_id_1c IS NULL;
@@ -0,0 +1,5 @@
+INSERT INTO tmp_stock_prices_products
+(product_id_1c, price, total_quantity)
+SELECT product_id_1c, price, total_quantity
+FROM tmp_stock_prices_products_all
+WHERE product_id_1c > %s AND product_id_1c <= %s;
@@ -0,0 +1,5 @@
+INSERT INTO tmp_stock_prices_stocks
+(product_id_1c, stock_id_1c, quantity)
+SELECT product_id_1c, stock_id_1c, quantity
+FROM tmp_stock_prices_stocks_all
+WHERE product_id_1c > %s AND product_id_1c <= %s;
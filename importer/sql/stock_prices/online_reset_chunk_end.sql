@@ -0,0 +1,10 @@
+-- Последний id следующего диапазона shop_product для шагов Reset в онлайн-режиме:
+-- первые N товаров магазина после предыдущего диапазона. NULL - все товары обработаны.
+SELECT MAX(id)
+FROM (
+    SELECT id
+    FROM shop_product
+    WHERE id > %s
+    ORDER BY id
+    LIMIT %s
+) chunk;
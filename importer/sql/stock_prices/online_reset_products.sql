@@ -0,0 +1,18 @@
+-- reset_missing_products.sql для диапазона shop_product.id (онлайн-режим).
+UPDATE shop_product p
+LEFT JOIN tmp_stock_prices_products t ON t.product_id_1c = p.id_1c
+SET
+    p.price = 0,
+    p.base_price = 0,
+    p.min_price = 0,
+    p.max_price = 0,
+    p.count = 0
+WHERE p.id > %s AND p.id <= %s
+  AND t.product_id_1c IS NULL
+  AND (
+    NOT (p.price <=> 0) OR
+    NOT (p.base_price <=> 0) OR
+    NOT (p.min_price <=> 0) OR
+    NOT (p.max_price <=> 0) OR
+    NOT (p.count <=> 0)
+  );
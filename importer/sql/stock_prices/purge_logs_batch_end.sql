@@ -0,0 +1,9 @@
+-- Последний id следующей пачки: не больше N записей после предыдущей пачки.
+SELECT MAX(id)
+FROM (
+    SELECT id
+    FROM shop_product_stocks_log
+    WHERE id > %s AND id <= %s
+    ORDER BY id
+    LIMIT %s
+) batch;
@@ -0,0 +1,4 @@
+-- Диапазон id записей лога старше срока хранения.
+SELECT MIN(id), MAX(id)
+FROM shop_product_stocks_log
+WHERE datetime < %s;
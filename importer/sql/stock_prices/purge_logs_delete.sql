@@ -0,0 +1,3 @@
+DELETE FROM shop_product_stocks_log
+WHERE id > %s AND id <= %s
+  AND datetime < %s;
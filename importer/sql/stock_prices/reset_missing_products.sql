@@ -1,3 +1,4 @@
+-- Обнуляются только товары, которые еще не обнулены.
 UPDATE shop_product p
 LEFT JOIN tmp_stock_prices_products t ON t.product_id_1c = p.id_1c
 SET
@@ -6,4 +7,11 @@ SET
     p.min_price = 0,
     p.max_price = 0,
     p.count = 0
-WHERE t.product_id_1c IS NULL;
+WHERE t.product_id_1c IS NULL
+  AND (
+    NOT (p.price <=> 0) OR
+    NOT (p.base_price <=> 0) OR
+    NOT (p.min_price <=> 0) OR
+    NOT (p.max_price <=> 0) OR
+    NOT (p.count <=> 0)
+  );
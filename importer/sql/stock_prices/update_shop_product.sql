@@ -1,3 +1,6 @@
+-- Обновляются только товары, у которых изменилась цена или количество:
+-- неизмененные строки не блокируются и не пишутся в redo/binlog.
+-- Сравнение NULL-safe (<=>): схема shop_product не контролируется импортером.
 UPDATE shop_product p
 JOIN tmp_stock_prices_products t ON t.product_id_1c = p.id_1c
 SET
@@ -5,4 +8,10 @@ SET
   p.base_price = t.price,
   p.min_price = t.price,
   p.max_price = t.price,
-  p.count = t.total_quantity;
+  p.count = t.total_quantity
+WHERE
+  NOT (p.price <=> t.price) OR
+  NOT (p.base_price <=> t.price) OR
+  NOT (p.min_price <=> t.price) OR
+  NOT (p.max_price <=> t.price) OR
+  NOT (p.count <=> t.total_quantity);
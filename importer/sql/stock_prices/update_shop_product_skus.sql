@@ -1,3 +1,4 @@
+-- Обновляются только артикулы, у которых изменилась цена, количество или доступность.
 UPDATE shop_product_skus s
 JOIN tmp_stock_prices_products t ON t.product_id_1c = s.id_1c
 JOIN shop_product p ON p.id = s.product_id
@@ -5,4 +6,9 @@ SET
     s.price = t.price,
     s.primary_price = t.price,
     s.count = t.total_quantity,
-    s.available = 1;
+    s.available = 1
+WHERE
+    NOT (s.price <=> t.price) OR
+    NOT (s.primary_price <=> t.price) OR
+    NOT (s.count <=> t.total_quantity) OR
+    NOT (s.available <=> 1);
@@ -1,3 +1,4 @@
+-- В upsert попадают только новые остатки и остатки с измененным количеством.
 INSERT INTO shop_product_stocks (sku_id, stock_id, product_id, count)
 SELECT
     s.id as sku_id,
@@ -8,4 +9,6 @@ FROM tmp_stock_prices_stocks ts
 JOIN shop_product p ON p.id_1c = ts.product_id_1c
 JOIN shop_product_skus s ON s.id_1c = ts.product_id_1c
 JOIN shop_stock st ON st.id_1c = ts.stock_id_1c
+LEFT JOIN shop_product_stocks ps ON ps.sku_id = s.id AND ps.stock_id = st.id
+WHERE NOT (ps.count <=> ts.quantity)
 ON DUPLICATE KEY UPDATE count = VALUES(count);
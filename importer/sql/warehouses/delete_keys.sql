@@ -0,0 +1,4 @@
+DELETE t
+FROM warehouses t
+JOIN tmp_warehouses_deleted d
+  ON d.product_id_1c = t.product_id_1c AND d.stock_id_1c = t.stock_id_1c;
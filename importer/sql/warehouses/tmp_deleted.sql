@@ -0,0 +1,5 @@
+CREATE TEMPORARY TABLE tmp_warehouses_deleted (
+    product_id_1c VARCHAR(36) NOT NULL,
+    stock_id_1c VARCHAR(36) NOT NULL,
+    PRIMARY KEY (product_id_1c, stock_id_1c)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
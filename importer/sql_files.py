@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from importer.config import SQL_CONFIG, SQL_DIR
+
+
+def _read_sql_file(relative_path: str) -> str:
+    """
+    Читает SQL из <PROJECT_ROOT>/importer/sql/**/*
+    """
+    path = SQL_DIR / relative_path
+    if not path.exists():
+        raise FileNotFoundError(f"SQL-файл не найден: {path}")
+    sql = path.read_text(encoding="utf-8")
+    if not sql.strip():
+        raise ValueError(f"SQL-файл пуст: {path}")
+    return sql
+
+def _build_sql_registry(sql_config: dict) -> dict[str, str]:
+    """
+    Читает и проверяет все SQL-файлы, перечисленные в SQL_CONFIG.
+    Вызывается при импорте модуля: отсутствующий файл обнаруживается
+    до открытия любой транзакции.
+    """
+    registry: dict[str, str] = {}
+    for table_cfg in sql_config.values():
+        for value in table_cfg.values():
+            if isinstance(value, str) and value.endswith(".sql"):
+                registry[value] = _read_sql_file(value)
+    return registry
+
+SQL_REGISTRY = _build_sql_registry(SQL_CONFIG)
+
+def load_sql(relative_path: str) -> str:
+    """
+    Возвращает SQL из реестра, загруженного при старте.
+    """
+    return SQL_REGISTRY[relative_path]
@@ -1,69 +1,307 @@
-from typing import Any, Dict, List
+from __future__ import annotations
+
+import time
+import tempfile
+from contextlib import closing
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple, Union
 
 from mariadb import Error as mariadb_error
 
-from importer.config import SQL_CONFIG, SQL_DIR, TABLE_STOCK_PRICES, app_db_config
-from importer.db import close_db, connect_db
+from importer.config import (
+    LOAD_MODE_EXECUTEMANY,
+    LOAD_MODE_INFILE,
+    SQL_CONFIG,
+    STOCK_PRICES_CHUNK_PAUSE_SEC,
+    STOCK_PRICES_CHUNK_PRODUCTS,
+    STOCK_PRICES_SYNC_MODE,
+    SYNC_MODE_ATOMIC,
+    SYNC_MODE_ONLINE,
+    TABLE_STOCK_PRICES,
+)
+from importer.db import relaxed_checks
 from importer.logger import logger
+from importer.pipeline import iter_batches, threaded_batches
+from importer.snapshot import DeltaSnapshot, DeltaTracker
+from importer.sql_files import load_sql
+from importer.timings import Timings
 
 
 BATCH_SIZE = 10000
+# Суффикс временных таблиц stock_prices со всеми товарами в онлайн-режиме.
+ONLINE_ALL_SUFFIX = "_all"
+# Шаги Reset stock_prices (метрика, ключ SQL_CONFIG); в онлайн-режиме - с префиксом online_.
+RESET_STEPS = (
+    ("products_reset", "reset_products"),
+    ("skus_reset", "reset_skus"),
+    ("stocks_deleted", "delete_stocks_for_missing_products"),
+)
+
+# Коды ошибок, означающие запрет LOAD DATA LOCAL INFILE на сервере или клиенте:
+# ER_NOT_ALLOWED_COMMAND, CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+# ER_CLIENT_LOCAL_FILES_DISABLED (MySQL), ER_LOAD_INFILE_CAPABILITY_DISABLED (MariaDB).
+LOCAL_INFILE_DISABLED_ERRNOS = {1148, 2068, 3948, 4166}
+# Сколько предупреждений LOAD DATA приводится в тексте ошибки.
+LOAD_WARNINGS_SHOWN = 5
+
+# Флаг выгрузки (delete/Reset): значение или функция, которая вызывается
+# после загрузки всех строк, когда файл прочитан целиком.
+ImportFlag = Union[bool, Callable[[], bool]]
+
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _resolve_flag(flag: ImportFlag) -> bool:
+    return flag() if callable(flag) else flag
+
+def _tsv_value(value: Any) -> str:
+    """
+    Сериализует значение в формат LOAD DATA по умолчанию (TAB, '\\N' для NULL).
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).translate(_TSV_ESCAPES)
+
+class StagingLoader:
+    """
+    Загружает пачки строк во временную таблицу.
+    В режиме LOAD_MODE_INFILE пачка выгружается во временный TSV-файл и
+    загружается через LOAD DATA LOCAL INFILE; если сервер или клиент
+    запрещают local infile, загрузчик переключается на executemany
+    до конца работы.
+    INSERT выполняется через отдельный prepared-курсор: запрос готовится
+    на сервере один раз и переиспользуется для всех пачек.
+    """
+    def __init__(self, conn, table: str, columns: str, insert_sql: str, mode: str = LOAD_MODE_EXECUTEMANY):
+        self.cursor = conn.cursor()
+        self.insert_cursor = conn.cursor(prepared=True)
+        self.table = table
+        self.columns = columns
+        self.insert_sql = insert_sql
+        self.mode = mode
+
+    def close(self) -> None:
+        self.cursor.close()
+        self.insert_cursor.close()
+
+    def load(self, batch: Sequence[Sequence[Any]]) -> None:
+        if self.mode == LOAD_MODE_INFILE:
+            try:
+                self._load_infile(batch)
+                return
+            except mariadb_error as e:
+                if e.errno not in LOCAL_INFILE_DISABLED_ERRNOS:
+                    raise
+                logger.warning(
+                    f"LOAD DATA LOCAL INFILE недоступен для {self.table} (Code: {e.errno}). "
+                    "Загрузка через executemany."
+                )
+                self.mode = LOAD_MODE_EXECUTEMANY
+
+        self.insert_cursor.executemany(self.insert_sql, batch)
+
+    def _load_infile(self, batch: Sequence[Sequence[Any]]) -> None:
+        with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", newline="\n", suffix=".tsv", prefix=f"{self.table}_") as spool:
+            for row in batch:
+                spool.write("\t".join(_tsv_value(value) for value in row))
+                spool.write("\n")
+            spool.flush()
+
+            spool_path = spool.name.replace("\\", "\\\\").replace("'", "\\'")
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{spool_path}' "
+                f"INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                f"({self.columns})"
+            )
+
+        # В режиме LOCAL ошибки данных (усечение, неверные значения, дубликаты
+        # ключа) становятся предупреждениями даже в STRICT-режиме; для паритета
+        # с executemany любое предупреждение и неполная загрузка - ошибка.
+        if self.cursor.warnings:
+            count = self.cursor.warnings
+            self.cursor.execute(f"SHOW WARNINGS LIMIT {LOAD_WARNINGS_SHOWN}")
+            details = "; ".join(f"{level} {code}: {message}" for level, code, message in self.cursor.fetchall())
+            raise RuntimeError(f"LOAD DATA в {self.table}: предупреждений {count} ({details}).")
+        if self.cursor.rowcount != len(batch):
+            raise RuntimeError(
+                f"LOAD DATA загрузил {self.cursor.rowcount} из {len(batch)} строк в {self.table}."
+            )
+
+def _drop_tmp_tables(cursor, *tables: str) -> None:
+    """
+    Удаляет временные таблицы: соединение переиспользуется следующими импортами.
+    """
+    for table in tables:
+        try:
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+        except mariadb_error as e:
+            logger.error(f"Не удалось удалить временную таблицу {table}: {e}")
+
+def _execute_step(cursor, timings: Timings, cfg: dict, step: str, params: tuple | None = None) -> int:
+    """
+    Выполняет SQL-шаг cfg[step] (с параметрами params, если заданы)
+    с замером времени фазы sql.<step>. Возвращает rowcount.
+    """
+    with timings.span(f"sql.{step}") as span:
+        if params is None:
+            cursor.execute(load_sql(cfg[step]))
+        else:
+            cursor.execute(load_sql(cfg[step]), params)
+        span.rows = max(cursor.rowcount, 0)
+    return cursor.rowcount
+
+def _count_step(cursor, timings: Timings, cfg: dict, step: str) -> int:
+    """
+    Выполняет запрос-счетчик cfg[step] с замером времени фазы sql.<step>.
+    """
+    with timings.span(f"sql.{step}") as span:
+        cursor.execute(load_sql(cfg[step]))
+        span.rows = cursor.fetchone()[0]
+    return span.rows
 
-def _load_sql(relative_path: str) -> str:
+def _table_state(cursor, timings: Timings, cfg: dict) -> tuple[int, int]:
     """
-    Загружает SQL из <PROJECT_ROOT>/importer/sql/**/*
+    Число строк и контрольная сумма колонок columns_list целевой таблицы
+    (сумма CRC32 строк, не зависит от порядка) для проверки снимка дельты.
     """
-    path = SQL_DIR / relative_path
-    if not path.exists():
-        raise FileNotFoundError(f"SQL-файл не найден: {path}")
-    return path.read_text(encoding="utf-8")
+    columns = ", ".join(f"IFNULL({column.strip()}, 0x00)" for column in cfg["columns_list"].split(","))
+    with timings.span("sql.table_state"):
+        cursor.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS(0x1f, {columns}))), 0) FROM {cfg['target_table']}"
+        )
+        row_count, checksum = cursor.fetchone()
+    return row_count, int(checksum)
 
 def sync_data(
-        rows: list[Any],
-        is_delete: bool,
+        conn,
+        rows: Iterable[Any],
+        is_delete: ImportFlag,
         cfg: dict,
+        timings: Timings | None = None,
     ) -> dict[str, int]:
     """
     Синхронизирует данные с целевой таблицей через временную:
-    Возвращает статистику по операциям.
+    Строки принимаются потоком и загружаются пачками по мере парсинга.
+    Если валидных строк нет, транзакция откатывается без изменений.
+    is_delete определяется после загрузки строк: флаг может стоять в конце файла.
+    При cfg["delta_mode"] и актуальном локальном снимке во временную таблицу
+    попадают только новые и измененные строки, а удаление выполняется
+    по списку ключей, вычисленному на клиенте.
+    Возвращает статистику по операциям, длительности фаз пишутся в timings.
     """
-    conn = connect_db(config=app_db_config)
+    timings = timings or Timings()
     cursor = conn.cursor()
+    tmp_table = f"tmp_{cfg['target_table']}"
+    tmp_deleted_table = f"{tmp_table}_deleted"
 
     stats = {
+        "rows_parsed": 0,
+        "rows_staged": 0,
+        "rows_unchanged": 0,
         "db_inserted": 0,
         "db_updated": 0,
         "db_deleted": 0,
     }
 
+    snapshot = None
+    tracker = None
+
     try:
         cursor.execute("START TRANSACTION")
-        cursor.execute(_load_sql(cfg["tmp_table"]))
-
-        placeholders = ", ".join(["%s"] * len(rows[0]))
-        insert_tmp_sql = f"""
-            INSERT INTO tmp_{cfg["target_table"]}
-            ({cfg["columns_list"]})
-            VALUES ({placeholders})
-        """
-
-        for i in range(0, len(rows), BATCH_SIZE):
-            batch = rows[i:i + BATCH_SIZE]
-            cursor.executemany(insert_tmp_sql, batch)
-
-        cursor.execute(_load_sql(cfg["update"]))
-        stats["db_updated"] += cursor.rowcount
-
-        cursor.execute(_load_sql(cfg["insert"]))
-        stats["db_inserted"] += cursor.rowcount
-
-        if is_delete:
-            cursor.execute(_load_sql(cfg["delete"]))
-            stats["db_deleted"] += cursor.rowcount
-
-        conn.commit()
+        _execute_step(cursor, timings, cfg, "tmp_table")
+
+        if cfg.get("delta_mode"):
+            snapshot = DeltaSnapshot(cfg["target_table"])
+            tracker = DeltaTracker(
+                key_size=len(cfg["key_columns"].split(",")),
+                base=snapshot.load_if_fresh(*_table_state(cursor, timings, cfg)),
+            )
+            rows = tracker.track(rows)
+
+        placeholders = ", ".join(["%s"] * len(cfg["columns_list"].split(",")))
+        loader = StagingLoader(
+            conn,
+            table=tmp_table,
+            columns=cfg["columns_list"],
+            insert_sql=f"""
+                INSERT INTO {tmp_table}
+                ({cfg["columns_list"]})
+                VALUES ({placeholders})
+            """,
+            mode=cfg.get("load_mode", LOAD_MODE_EXECUTEMANY),
+        )
+
+        with timings.span("stage") as stage_span, relaxed_checks(cursor), closing(loader), \
+                closing(threaded_batches(rows, BATCH_SIZE)) as batches:
+            for batch in batches:
+                loader.load(batch)
+                stats["rows_staged"] += len(batch)
+                stage_span.rows += len(batch)
+
+        if tracker is not None:
+            stats["rows_parsed"] = tracker.rows_parsed
+            stats["rows_unchanged"] = tracker.rows_unchanged
+        else:
+            stats["rows_parsed"] = stats["rows_staged"]
+
+        if not stats["rows_parsed"]:
+            conn.rollback()
+            return stats
+
+        logger.info(
+            f"Загружено во временную таблицу: count={stats['rows_staged']}, "
+            f"без изменений={stats['rows_unchanged']}"
+        )
+        is_delete = _resolve_flag(is_delete)
+        logger.info(f"Параметры импорта: delete={is_delete}")
+
+        stats["db_updated"] += _execute_step(cursor, timings, cfg, "update")
+
+        stats["db_inserted"] += _execute_step(cursor, timings, cfg, "insert")
+
+        if is_delete and tracker is not None and tracker.is_delta:
+            deleted_keys = tracker.deleted_keys()
+            if deleted_keys:
+                _execute_step(cursor, timings, cfg, "tmp_deleted")
+                keys_loader = StagingLoader(
+                    conn,
+                    table=tmp_deleted_table,
+                    columns=cfg["key_columns"],
+                    insert_sql=f"""
+                        INSERT INTO {tmp_deleted_table}
+                        ({cfg["key_columns"]})
+                        VALUES ({", ".join(["%s"] * tracker.key_size)})
+                    """,
+                    mode=cfg.get("load_mode", LOAD_MODE_EXECUTEMANY),
+                )
+                with closing(keys_loader):
+                    for keys_batch in iter_batches(deleted_keys, BATCH_SIZE):
+                        keys_loader.load(keys_batch)
+                stats["db_deleted"] += _execute_step(cursor, timings, cfg, "delete_keys")
+        elif is_delete:
+            stats["db_deleted"] += _execute_step(cursor, timings, cfg, "delete")
+
+        next_state = None
+        db_checksum = 0
+        if snapshot is not None and tracker is not None:
+            # Снимок удаляется до фиксации: сбой между COMMIT и сохранением
+            # нового снимка приведет к полной синхронизации, а не к неверной дельте.
+            snapshot.invalidate()
+            next_state = tracker.next_state(is_delete)
+            if next_state is not None:
+                # Контрольная сумма считается в той же транзакции: изменения таблицы
+                # другими клиентами после COMMIT не попадут в снимок как свои.
+                _, db_checksum = _table_state(cursor, timings, cfg)
+
+        with timings.span("commit"):
+            conn.commit()
         logger.success("Транзакция зафиксирована.")
 
+        if next_state is not None:
+            snapshot.save(next_state, db_checksum)
+
         return stats
 
     except mariadb_error as e:
@@ -75,73 +313,200 @@ def sync_data(
         logger.exception(f"Ошибка синхронизации данных: {e}")
         raise
     finally:
+        _drop_tmp_tables(cursor, tmp_table, tmp_deleted_table)
         cursor.close()
-        close_db(conn)
+
+def _commit(conn, timings: Timings) -> None:
+    with timings.span("commit"):
+        conn.commit()
+
+def _apply_stock_prices(cursor, timings: Timings, cfg: dict, stats: Dict[str, int]) -> None:
+    """
+    Применяет товары и склады из временных таблиц к таблицам магазина.
+    UPDATE затрагивают только строки с изменившимися ценами/количеством;
+    неизмененные - найденные в магазине строки за вычетом обновленных.
+    """
+    products_updated = _execute_step(cursor, timings, cfg, "update_products")
+    skus_updated = _execute_step(cursor, timings, cfg, "update_skus")
+    stats["products_updated"] += products_updated
+    stats["skus_updated"] += skus_updated
+    stats["products_unchanged"] += _count_step(cursor, timings, cfg, "count_products") - products_updated
+    stats["skus_unchanged"] += _count_step(cursor, timings, cfg, "count_skus") - skus_updated
+    if cfg.get("log_stocks"):
+        # До upsert: before_count - количество, которое upsert перезапишет.
+        stats["stocks_logged"] += _execute_step(cursor, timings, cfg, "insert_stocks_log")
+    stats["stocks_upserted"] += _execute_step(cursor, timings, cfg, "upsert_stocks")
+    _execute_step(cursor, timings, cfg, "delete_missing_stocks_per_product")
+
+def _apply_stock_prices_online(conn, cursor, timings: Timings, cfg: dict, stats: Dict[str, int]) -> None:
+    """
+    Онлайн-режим: загруженные временные таблицы переименовываются в *_all,
+    а SQL-шаги выполняются над диапазонами по STOCK_PRICES_CHUNK_PRODUCTS товаров,
+    которые копируются из них во временные таблицы с исходными именами.
+    Каждый диапазон - отдельная транзакция, блокировки строк магазина держатся
+    только на время диапазона. В конце полные таблицы возвращаются под исходными
+    именами: они нужны шагам Reset.
+    """
+    tables = (cfg["tmp_products_table"], cfg["tmp_stocks_table"])
+    for table in tables:
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}{ONLINE_ALL_SUFFIX}")
+    _execute_step(cursor, timings, cfg, "tmp_products")
+    _execute_step(cursor, timings, cfg, "tmp_stocks")
+
+    last_key = ""
+    while True:
+        cursor.execute(load_sql(cfg["online_chunk_end"]), (last_key, STOCK_PRICES_CHUNK_PRODUCTS))
+        chunk_end = cursor.fetchone()[0]
+        if chunk_end is None:
+            break
+        if stats["chunks_committed"]:
+            time.sleep(STOCK_PRICES_CHUNK_PAUSE_SEC)
+
+        for table in tables:
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(load_sql(cfg["online_fill_products"]), (last_key, chunk_end))
+        cursor.execute(load_sql(cfg["online_fill_stocks"]), (last_key, chunk_end))
+
+        _apply_stock_prices(cursor, timings, cfg, stats)
+        _commit(conn, timings)
+        stats["chunks_committed"] += 1
+        last_key = chunk_end
+
+    logger.info(f"Онлайн-синхронизация: применено диапазонов={stats['chunks_committed']}")
+    for table in tables:
+        cursor.execute(f"DROP TEMPORARY TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}{ONLINE_ALL_SUFFIX} RENAME TO {table}")
+
+def _reset_stock_prices_online(conn, cursor, timings: Timings, cfg: dict, stats: Dict[str, int]) -> None:
+    """
+    Шаги Reset онлайн-режима: товары магазина, отсутствующие в файле, обнуляются
+    диапазонами по STOCK_PRICES_CHUNK_PRODUCTS товаров shop_product (по id), все три
+    шага диапазона - одна короткая транзакция. Диапазоны ключей файла здесь не
+    подходят: шаги затрагивают как раз товары, которых в файле нет.
+    """
+    last_id = 0
+    chunks = 0
+    while True:
+        cursor.execute(load_sql(cfg["online_reset_chunk_end"]), (last_id, STOCK_PRICES_CHUNK_PRODUCTS))
+        chunk_end = cursor.fetchone()[0]
+        if chunk_end is None:
+            break
+        if chunks:
+            time.sleep(STOCK_PRICES_CHUNK_PAUSE_SEC)
+
+        for stat, step in RESET_STEPS:
+            stats[stat] += _execute_step(cursor, timings, cfg, f"online_{step}", (last_id, chunk_end))
+        _commit(conn, timings)
+        chunks += 1
+        stats["chunks_committed"] += 1
+        last_id = chunk_end
+
+    logger.info(f"Онлайн-синхронизация: диапазонов Reset={chunks}")
 
 def sync_stock_prices(
-        products_data: List,
-        stocks_data: List,
-        is_reset: bool
+        conn,
+        lines: Iterable[Tuple[Sequence[Any], List[Sequence[Any]]]],
+        is_reset: ImportFlag,
+        timings: Timings | None = None,
+        mode: str = STOCK_PRICES_SYNC_MODE,
     ) -> Dict[str, int]:
+    """
+    Синхронизирует цены и остатки. lines - поток пар (товар, склады товара),
+    загружаемый во временные таблицы пачками по мере парсинга. Товар и склады -
+    кортежи в порядке колонок tmp_products_columns и tmp_stocks_columns.
+    Если валидных товаров нет, транзакция откатывается без изменений.
+    is_reset определяется после загрузки строк: флаг может стоять в конце файла.
+    mode: SYNC_MODE_ATOMIC - все изменения одной транзакцией; SYNC_MODE_ONLINE -
+    короткими транзакциями по диапазонам товаров (при сбое уже примененные
+    диапазоны остаются в БД, повторный импорт файла их не меняет).
+    """
+    if mode not in (SYNC_MODE_ATOMIC, SYNC_MODE_ONLINE):
+        raise ValueError(f"Неизвестный режим синхронизации stock_prices: {mode}")
+
     cfg = SQL_CONFIG[TABLE_STOCK_PRICES]
+    timings = timings or Timings()
 
-    conn = connect_db(config=app_db_config)
     cursor = conn.cursor()
 
     stats = {
+        "products_staged": 0,
+        "stocks_staged": 0,
         "products_updated": 0,
+        "products_unchanged": 0,
         "skus_updated": 0,
+        "skus_unchanged": 0,
         "stocks_upserted": 0,
+        "stocks_logged": 0,
         "products_reset": 0,
         "skus_reset": 0,
-        "stocks_deleted": 0
+        "stocks_deleted": 0,
+        "chunks_committed": 0,
     }
 
-    products_tuples = [(p.product_id_1c, p.price, p.total_quantity) for p in products_data]
-    stocks_tuples = [(s.product_id_1c, s.stock_id_1c, s.quantity) for s in stocks_data]
-
     try:
         cursor.execute("START TRANSACTION")
         # Очистка дубликатов
-        # cursor.execute(_load_sql("stock_prices/cleanup_duplicates.sql"))
-
-        cursor.execute(_load_sql(cfg["tmp_products"]))
-        cursor.execute(_load_sql(cfg["tmp_stocks"]))
-
-        if products_tuples:
-            for i in range(0, len(products_tuples), BATCH_SIZE):
-                batch = products_tuples[i:i + BATCH_SIZE]
-                cursor.executemany(_load_sql(cfg["insert_tmp_products"]), batch)
-
-        if stocks_tuples:
-            for i in range(0, len(stocks_tuples), BATCH_SIZE):
-                batch = stocks_tuples[i:i + BATCH_SIZE]
-                cursor.executemany(_load_sql(cfg["insert_tmp_stocks"]), batch)
-
-        cursor.execute(_load_sql(cfg["update_products"]))
-        stats["products_updated"] = cursor.rowcount
-
-        cursor.execute(_load_sql(cfg["update_skus"]))
-        stats["skus_updated"] = cursor.rowcount
-
-        cursor.execute(_load_sql(cfg["upsert_stocks"]))
-        stats["stocks_upserted"] = cursor.rowcount
-
-        cursor.execute(_load_sql(cfg["delete_missing_stocks_per_product"]))
-
-        if is_reset:
-            cursor.execute(_load_sql(cfg["reset_products"]))
-            stats["products_reset"] = cursor.rowcount
-
-            cursor.execute(_load_sql(cfg["reset_skus"]))
-            stats["skus_reset"] = cursor.rowcount
-
-            cursor.execute(_load_sql(cfg["delete_stocks_for_missing_products"]))
-            stats["stocks_deleted"] = cursor.rowcount
-
-        cursor.execute(_load_sql(cfg["clean_logs"]))
-
-        conn.commit()
+        # cursor.execute(load_sql("stock_prices/cleanup_duplicates.sql"))
+
+        _execute_step(cursor, timings, cfg, "tmp_products")
+        _execute_step(cursor, timings, cfg, "tmp_stocks")
+
+        load_mode = cfg.get("load_mode", LOAD_MODE_EXECUTEMANY)
+        products_loader = StagingLoader(
+            conn,
+            table=cfg["tmp_products_table"],
+            columns=cfg["tmp_products_columns"],
+            insert_sql=load_sql(cfg["insert_tmp_products"]),
+            mode=load_mode,
+        )
+        stocks_loader = StagingLoader(
+            conn,
+            table=cfg["tmp_stocks_table"],
+            columns=cfg["tmp_stocks_columns"],
+            insert_sql=load_sql(cfg["insert_tmp_stocks"]),
+            mode=load_mode,
+        )
+
+        with timings.span("stage") as stage_span, relaxed_checks(cursor), \
+                closing(products_loader), closing(stocks_loader), \
+                closing(threaded_batches(lines, BATCH_SIZE)) as batches:
+            for batch in batches:
+                # Строки уже в порядке колонок временных таблиц: в пачки
+                # попадают ссылки на них, без построения новых кортежей.
+                products = [product for product, _ in batch]
+                products_loader.load(products)
+                stats["products_staged"] += len(products)
+                stage_span.rows += len(products)
+
+                stocks = [stock for _, product_stocks in batch for stock in product_stocks]
+                for stocks_batch in iter_batches(stocks, BATCH_SIZE):
+                    stocks_loader.load(stocks_batch)
+                    stats["stocks_staged"] += len(stocks_batch)
+                    stage_span.rows += len(stocks_batch)
+
+        if not stats["products_staged"]:
+            conn.rollback()
+            return stats
+
+        logger.info(
+            f"Загружено во временные таблицы: товаров={stats['products_staged']}, "
+            f"записей складов={stats['stocks_staged']}"
+        )
+        is_reset = _resolve_flag(is_reset)
+        logger.info(f"Параметры импорта: reset={is_reset}, режим={mode}")
+
+        if mode == SYNC_MODE_ONLINE:
+            _apply_stock_prices_online(conn, cursor, timings, cfg, stats)
+        else:
+            _apply_stock_prices(cursor, timings, cfg, stats)
+
+        if is_reset and mode == SYNC_MODE_ONLINE:
+            _reset_stock_prices_online(conn, cursor, timings, cfg, stats)
+        elif is_reset:
+            for stat, step in RESET_STEPS:
+                stats[stat] = _execute_step(cursor, timings, cfg, step)
+
+        _commit(conn, timings)
         logger.success("Синхронизация цен и остатков успешно завершена.")
 
         return stats
@@ -155,5 +520,11 @@ def sync_stock_prices(
         logger.exception(f"Ошибка синхронизации stock_prices: {e}")
         raise
     finally:
+        _drop_tmp_tables(
+            cursor,
+            cfg["tmp_products_table"],
+            cfg["tmp_stocks_table"],
+            f"{cfg['tmp_products_table']}{ONLINE_ALL_SUFFIX}",
+            f"{cfg['tmp_stocks_table']}{ONLINE_ALL_SUFFIX}",
+        )
         cursor.close()
-        close_db(conn)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+import time
+import resource
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, TypeVar
+
+
+T = TypeVar("T")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+# Как часто measure_iter снимает текущий RSS между элементами.
+RSS_SAMPLE_INTERVAL_SEC = 0.25
+
+
+def peak_rss_mb() -> float:
+    """
+    Пиковый RSS процесса (МБ) с момента запуска. Имеет смысл для процесса,
+    выполняющего одну задачу (бенчмарки); для фаз импорта учитывается
+    только его прирост за фазу (см. RssPeak).
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def current_rss_mb() -> float | None:
+    """Текущий RSS процесса (МБ) из /proc/self/statm; None, если недоступен."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * PAGE_SIZE / 1024 / 1024, 1)
+
+class RssPeak:
+    """
+    Пиковый RSS (МБ) за интервал. Берется максимум из снятых замеров
+    current_rss_mb(); если за интервал вырос ru_maxrss процесса, значит
+    пик процесса был внутри интервала, и он тоже учитывается.
+    """
+    def __init__(self):
+        self._maxrss_start = peak_rss_mb()
+        self.peak: float | None = None
+        self.sample()
+
+    def sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def finish(self) -> float | None:
+        self.sample()
+        maxrss = peak_rss_mb()
+        if maxrss > self._maxrss_start and (self.peak is None or maxrss > self.peak):
+            self.peak = maxrss
+        return self.peak
+
+class PhaseSpan:
+    """Счетчики фазы, заполняемые внутри span()."""
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+class Timings:
+    """
+    Замеры фаз импорта по монотонным часам (time.perf_counter).
+    Повторные замеры одной фазы суммируются. Потокобезопасен:
+    парсинг измеряется в потоке-производителе конвейера.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases: dict[str, dict[str, Any]] = {}
+
+    def record(
+        self, name: str, duration: float = 0.0, rows: int = 0, bytes_count: int = 0, rss_peak: float | None = None
+    ) -> None:
+        """Добавляет длительность и счетчики к фазе; rss_peak - максимум по всем замерам фазы."""
+        with self._lock:
+            phase = self._phases.setdefault(name, {"duration_sec": 0.0, "rows": 0, "bytes": 0, "rss_peak_mb": None})
+            phase["duration_sec"] += duration
+            phase["rows"] += rows
+            phase["bytes"] += bytes_count
+            if rss_peak is not None and (phase["rss_peak_mb"] is None or rss_peak > phase["rss_peak_mb"]):
+                phase["rss_peak_mb"] = rss_peak
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[PhaseSpan]:
+        """
+        Замеряет блок кода как фазу name.
+        """
+        span = PhaseSpan()
+        rss = RssPeak()
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self.record(name, time.perf_counter() - started, span.rows, span.bytes, rss.finish())
+
+    def measure_iter(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """
+        Оборачивает генератор: в фазу name входит только время получения
+        элементов (без ожидания потребителя), rows - число элементов.
+        """
+        iterator = iter(items)
+        duration = 0.0
+        rows = 0
+        rss = RssPeak()
+        sampled = time.perf_counter()
+        try:
+            while True:
+                started = time.perf_counter()
+                if started - sampled >= RSS_SAMPLE_INTERVAL_SEC:
+                    rss.sample()
+                    sampled = started
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    duration += time.perf_counter() - started
+                rows += 1
+                yield item
+        finally:
+            self.record(name, duration, rows, rss_peak=rss.finish())
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, phase in self._phases.items():
+                duration = phase["duration_sec"]
+                result[name] = {
+                    "duration_sec": round(duration, 4),
+                    "rows": phase["rows"],
+                    "rows_per_sec": round(phase["rows"] / duration, 1) if duration and phase["rows"] else None,
+                    "bytes": phase["bytes"],
+                    "bytes_per_sec": round(phase["bytes"] / duration, 1) if duration and phase["bytes"] else None,
+                    "rss_peak_mb": phase["rss_peak_mb"],
+                }
+            return result
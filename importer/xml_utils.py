@@ -1,97 +1,375 @@
 from __future__ import annotations
 
+import os
+import gzip
+import lzma
+import hashlib
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterator
+from typing import BinaryIO, Callable, Iterator
 from xml.etree.ElementTree import Element, ParseError, iterparse
 
+from importer.config import XML_PARSER
+
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CONVERTER_CACHE_SIZE = 8192
+BOOL_CACHE_SIZE = 16
+
+# Типы ошибок строк (группировка в отчете).
+ROW_ERROR_MISSING = "missing"
+ROW_ERROR_INVALID = "invalid"
+ROW_ERROR_UNKNOWN = "unknown"
+
+
+class RowParseError(ValueError):
+    """
+    Ошибка данных строки с типом (ROW_ERROR_*) и полем, к которому она относится.
+    """
+    def __init__(self, message: str, field: str | None = None, kind: str = ROW_ERROR_INVALID):
+        super().__init__(message)
+        self.field = field
+        self.kind = kind
+
+def describe_row_error(exc: Exception) -> tuple[str, str, str | None]:
+    """Сообщение, тип и поле ошибки разбора строки для ImportReport.add_row_error."""
+    if isinstance(exc, RowParseError):
+        return str(exc), exc.kind, exc.field
+    if isinstance(exc, ValueError):
+        return str(exc), ROW_ERROR_INVALID, None
+    return f"Неизвестная ошибка парсинга: {exc}", ROW_ERROR_UNKNOWN, None
+
+XML_SUFFIX = ".xml"
+# Сжатые выгрузки (<имя>.xml.gz, .xml.xz, .xml.zst) распаковываются потоково:
+# сжатый файл читается блоками, парсер получает распакованные байты.
+COMPRESSED_SUFFIXES = (".gz", ".xz", ".zst")
+
+def xml_base_name(file_path: str | Path) -> str:
+    """
+    Имя выгрузки без расширения сжатия: stock_prices.xml.gz -> stock_prices.xml.
+    """
+    name = Path(file_path).name
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(XML_SUFFIX + suffix):
+            return name[:-len(suffix)]
+    return name
+
+def is_xml_file(file_path: str | Path) -> bool:
+    """XML-выгрузка, в том числе сжатая."""
+    return xml_base_name(file_path).endswith(XML_SUFFIX)
+
+def is_compressed(file_path: str | Path) -> bool:
+    return xml_base_name(file_path) != Path(file_path).name
+
+@contextmanager
+def open_decompressed(file_path: Path, raw: BinaryIO) -> Iterator[BinaryIO]:
+    """
+    Поток распакованного содержимого raw по расширению file_path
+    (для несжатого файла - сам raw). raw не закрывается.
+    """
+    suffix = file_path.suffix if is_compressed(file_path) else ""
+    if suffix == ".gz":
+        with gzip.GzipFile(fileobj=raw, mode="rb") as source:
+            yield source
+    elif suffix == ".xz":
+        with lzma.LZMAFile(raw) as source:
+            yield source
+    elif suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("Для файлов .xml.zst нужен пакет zstandard (uv sync --extra zstd).")
+        with zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False) as source:
+            yield source
+    else:
+        yield raw
 
 def get_xml_files(watch_dir: str | Path) -> list[Path]:
     """
-    Возвращает список XML-файлов в указанной директории.
+    Возвращает список XML-файлов (в том числе сжатых) в указанной директории.
     """
     dir = Path(watch_dir)
-    return list(dir.glob("*.xml"))
+    return [path for path in dir.iterdir() if path.is_file() and is_xml_file(path)]
 
-def parse_bool(text: str | None, line: int, field_name: str = "unknown") -> int:
+def iter_lines(xml_path: Path) -> Iterator[Element]:
     """
-    Парсит boolean из строки 'true'/'false' в 1/0.
+    Потоковый итератор по элементам <line>.
     """
-    if not text:
-        raise ValueError(f"Отсутствует значение '{field_name}' в строке #{line}.")
+    return XmlReader(xml_path).lines()
 
+def _bool_from_text(text: str) -> int | None:
     clean_text = text.strip().lower()
-
     if clean_text == "true":
         return 1
     if clean_text == "false":
         return 0
-    raise ValueError(f"Некорректное значение '{field_name}' в строке #{line}: '{text}'. Ожидается true/false.")
+    return None
 
-def iter_lines(xml_path: Path) -> Iterator[Element]:
+def _date_from_text(text: str) -> date | None:
+    clean_text = text.strip()
+    if not clean_text:
+        return None
+    return datetime.fromisoformat(clean_text).date()
+
+class ValueConverters:
     """
-    Потоковый итератор по элементам <line>.
+    Конвертеры значений атрибутов с ограниченными LRU-кэшами: строк в выгрузке
+    сотни тысяч, а различных дат, цен и кодов складов - немного.
+    Экземпляр создается на файл (в параллельном разборе - на процесс),
+    поэтому счетчики кэшей относятся к одному импорту.
     """
-    try:
-        context = iterparse(xml_path, events=("end",))
-        for _, elem in context:
-            if elem.tag == "line":
-                yield elem
-                elem.clear()
-    except ParseError as e:
-        raise ParseError(f"Критическая ошибка структуры XML: {e}") from e
+    def __init__(self, cache_size: int = CONVERTER_CACHE_SIZE):
+        self._bool = lru_cache(maxsize=BOOL_CACHE_SIZE)(_bool_from_text)
+        self._date = lru_cache(maxsize=cache_size)(_date_from_text)
+        self.decimal: Callable[[str], Decimal] = lru_cache(maxsize=cache_size)(Decimal)
+
+    def parse_bool(self, text: str | None, line: int, field_name: str = "unknown") -> int:
+        """
+        Парсит boolean из строки 'true'/'false' в 1/0.
+        """
+        if not text:
+            raise RowParseError(f"Отсутствует значение '{field_name}' в строке #{line}.", field_name, ROW_ERROR_MISSING)
 
-def parse_datetime_to_date(text: str | None, line: int, field_name: str = "unknown") -> date | None:
+        value = self._bool(text)
+        if value is None:
+            raise RowParseError(
+                f"Некорректное значение '{field_name}' в строке #{line}: '{text}'. Ожидается true/false.", field_name)
+        return value
+
+    def parse_datetime_to_date(self, text: str | None, line: int, field_name: str = "unknown") -> date | None:
+        """
+        Парсит ISO-datetime (YYYY-MM-DDTHH:MM:SS) и возвращает date.
+        """
+        if not text:
+            return None
+
+        try:
+            return self._date(text)
+        except ValueError as e:
+            raise RowParseError(f"Некорректный формат даты в строке #{line} в поле '{field_name}': '{text}'."
+                                "Ожидается ISO-datetime (YYYY-MM-DDTHH:MM:SS).", field_name) from e
+
+    def cache_stats(self) -> dict[str, tuple[int, int]]:
+        """Попадания и промахи кэшей использованных конвертеров."""
+        caches = {"bool": self._bool, "date": self._date, "decimal": self.decimal}
+        stats = {}
+        for name, converter in caches.items():
+            info = converter.cache_info()
+            if info.hits or info.misses:
+                stats[name] = (info.hits, info.misses)
+        return stats
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Размер начального и конечного блоков для быстрого отпечатка файла (file_edges_sha256).
+EDGE_BLOCK_SIZE = 64 * 1024
+# Номер, с которым в сообщениях об ошибках нумеруется первый <line> выгрузки.
+FIRST_LINE_NUMBER = 6
+
+def file_sha256(file_path: Path) -> str:
     """
-    Парсит ISO-datetime (YYYY-MM-DDTHH:MM:SS) и возвращает date.
+    Считает SHA-256 содержимого файла.
     """
-    if not text:
-        return None
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    clean_text = text.strip()
+def file_edges_sha256(file_path: Path, block_size: int = EDGE_BLOCK_SIZE) -> str:
+    """
+    SHA-256 первого и последнего блоков файла: дешевый отпечаток, по которому
+    заведомо разные файлы одного размера отличаются без чтения всего файла
+    (в начале выгрузки 1С - дата info_update).
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        digest.update(f.read(block_size))
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - block_size, block_size))
+        digest.update(f.read(block_size))
+    return digest.hexdigest()
 
-    if not clean_text:
-        return None
+class HashingReader:
+    """
+    Обертка над бинарным файлом: считает SHA-256 прочитанных байт,
+    чтобы хэш содержимого вычислялся в том же проходе, что и парсинг.
+    Для сжатого файла стоит под распаковщиком: хэш и bytes_read относятся
+    к файлу на диске, как и в HashManifest.
+    """
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        self.bytes_read = 0
+        self._digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self._digest.update(data)
+        self.bytes_read += len(data)
+        return data
+
+    def consume(self) -> None:
+        """Дочитывает оставшиеся байты, чтобы хэш охватил весь файл."""
+        for _ in iter(lambda: self.read(HASH_CHUNK_SIZE), b""):
+            pass
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
 
-    try:
-        return datetime.fromisoformat(clean_text).date()
-    except ValueError as e:
-        raise ValueError(f"Некорректный формат даты в строке #{line} в поле '{field_name}': '{text}'."
-                         "Ожидается ISO-datetime (YYYY-MM-DDTHH:MM:SS).") from e
+XmlEvents = Iterator[tuple[str, Element]]
 
-def _read_flag(xml_path: Path, tag_name: str) -> bool:
+def _etree_events(source: BinaryIO, tags: tuple[str, ...]) -> XmlEvents:
     """
-    Функция для чтения boolean-флага из XML.
+    Бэкенд xml.etree: события ("start"/"end") только для тегов tags.
+    После обработки <line> удаляет обработанные элементы из родителя,
+    чтобы дерево не накапливало пустые <line> и память не росла.
     """
-    context = iterparse(str(xml_path), events=("end",))
-    for _, elem in context:
-        if elem.tag == tag_name:
-            val = (elem.text or "").strip().lower() == "true"
-            elem.clear()
-            return val
-        elem.clear()
-    return False
+    stack: list[Element] = []
+    for event, elem in iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag in tags:
+                yield event, elem
+            continue
+        stack.pop()
+        if elem.tag in tags:
+            yield event, elem
+        if elem.tag == "line" and stack:
+            del stack[-1][:]
 
-def read_delete_flag(xml_path: Path) -> bool:
+def _lxml_events(source: BinaryIO, tags: tuple[str, ...]) -> XmlEvents:
     """
-    True, если в XML встречается <delete>true</delete>, иначе False.
+    Бэкенд lxml: фильтрация тегов на стороне парсера, поддержка huge_tree,
+    после обработки <line> удаляются предшествующие соседние элементы.
     """
-    return _read_flag(xml_path, "delete")
+    context = lxml_etree.iterparse(
+        source,
+        events=("start", "end"),
+        tag=tags,
+        huge_tree=True,
+        resolve_entities=False,
+    )
+    for event, elem in context:
+        yield event, elem
+        if event == "end" and elem.tag == "line":
+            parent = elem.getparent()
+            while elem.getprevious() is not None:
+                del parent[0]
 
-def read_reset_flag(xml_path: Path) -> bool:
+XML_BACKENDS: dict[str, Callable[[BinaryIO, tuple[str, ...]], XmlEvents]] = {"etree": _etree_events}
+if lxml_etree is not None:
+    XML_BACKENDS["lxml"] = _lxml_events
+
+PARSE_ERRORS: tuple[type[Exception], ...] = (ParseError,) if lxml_etree is None else (ParseError, lxml_etree.Error)
+DECOMPRESS_ERRORS: tuple[type[Exception], ...] = (EOFError, gzip.BadGzipFile, lzma.LZMAError) \
+    if zstandard is None else (EOFError, gzip.BadGzipFile, lzma.LZMAError, zstandard.ZstdError)
+
+def resolve_xml_backend(name: str = XML_PARSER) -> str:
     """
-    True, если в XML встречается <Reset>true</Reset>, иначе False.
+    Имя бэкенда парсера: auto - lxml, если установлен, иначе etree.
     """
-    return _read_flag(xml_path, "Reset")
+    if name == "auto":
+        return "lxml" if "lxml" in XML_BACKENDS else "etree"
+    if name not in XML_BACKENDS:
+        raise ValueError(f"Парсер XML '{name}' недоступен. Доступны: {', '.join(XML_BACKENDS)}.")
+    return name
 
-def get_info_update_date(xml_path: Path) -> str | None:
+@dataclass
+class XmlHeader:
     """
-    Читает атрибут date из тега <info_update>.
+    Параметры выгрузки из заголовка XML: <info_update date>, <delete>, <Reset>.
     """
-    context = iterparse(str(xml_path), events=("start",))
-    for _, elem in context:
-        if elem.tag == "info_update":
-            date_val = elem.get("date")
-            elem.clear()
-            return date_val
-    return None
+    FLAG_TAGS = {"delete": "is_delete", "Reset": "is_reset"}
+    TAGS = ("info_update", *FLAG_TAGS)
+
+    info_update_date: str | None = None
+    is_delete: bool = False
+    is_reset: bool = False
+
+    def update(self, event: str, elem: Element) -> None:
+        """Учитывает событие парсера для тегов TAGS."""
+        if event == "start" and elem.tag == "info_update":
+            self.info_update_date = elem.get("date")
+        elif event == "end" and elem.tag in self.FLAG_TAGS:
+            value = (elem.text or "").strip().lower() == "true"
+            setattr(self, self.FLAG_TAGS[elem.tag], value)
+
+
+class XmlReader:
+    """
+    Потоковый читатель XML-выгрузки.
+    Заголовок (до первого <line>) разбирается при создании отдельным коротким
+    проходом, lines() открывает файл заново и создает свой контекст парсера
+    при первом обращении: итератор iterparse создается и используется в одном
+    потоке (lines() выполняется в потоке-производителе конвейера).
+    После полного прохода по lines() доступен SHA-256 содержимого (content_hash).
+    Парсер выбирается параметром backend (по умолчанию XML_PARSER).
+    """
+    EVENT_TAGS = (*XmlHeader.TAGS, "line")
+
+    def __init__(self, xml_path: Path, backend: str = XML_PARSER):
+        self.xml_path = xml_path
+        self.backend = resolve_xml_backend(backend)
+        self.header = XmlHeader()
+        self.content_hash: str | None = None
+        self.bytes_read = 0
+        self._events: XmlEvents | None = None
+        self._read_header()
+
+    def _iter_events(self) -> XmlEvents:
+        try:
+            with open(self.xml_path, "rb") as raw:
+                hashing = HashingReader(raw)
+                with open_decompressed(self.xml_path, hashing) as source:
+                    yield from XML_BACKENDS[self.backend](source, self.EVENT_TAGS)
+                hashing.consume()
+                self.content_hash = hashing.hexdigest()
+                self.bytes_read = hashing.bytes_read
+        except PARSE_ERRORS as e:
+            raise ParseError(f"Критическая ошибка структуры XML: {e}") from e
+        except DECOMPRESS_ERRORS as e:
+            raise ParseError(f"Ошибка распаковки файла '{self.xml_path.name}': {e}") from e
+
+    def _read_header(self) -> None:
+        """
+        Читает события до открытия первого <line> и закрывает этот проход.
+        """
+        events = self._iter_events()
+        try:
+            for event, elem in events:
+                if event == "start" and elem.tag == "line":
+                    return
+                self.header.update(event, elem)
+        finally:
+            events.close()
+
+    def close(self) -> None:
+        """Закрывает файл, если проход по lines() начат, но не выполнен до конца."""
+        if self._events is not None:
+            self._events.close()
+
+    def lines(self) -> Iterator[Element]:
+        """
+        Проходит файл с начала и отдает элементы <line>.
+        Флаги, расположенные после строк (нетипично для выгрузок 1С),
+        попадают в header только после полного прохода по lines(),
+        поэтому delete/Reset применяются после загрузки всех строк.
+        """
+        self._events = self._iter_events()
+        for event, elem in self._events:
+            if event == "end" and elem.tag == "line":
+                yield elem
+                elem.clear()
+            else:
+                self.header.update(event, elem)
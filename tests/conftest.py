@@ -0,0 +1,19 @@
+"""
+Тесты не требуют .env: importer.config получает обязательные настройки из TEST_ENV.
+"""
+import dotenv
+
+
+TEST_ENV = {
+    "DB_HOST": "localhost",
+    "DB_PORT": "3306",
+    "DB_NAME": "test",
+    "DB_ADMIN_USERNAME": "test",
+    "DB_ADMIN_PASSWORD": "test",
+    "DB_APP_USERNAME": "test",
+    "DB_APP_PASSWORD": "test",
+    "DB_APP_ALLOWED_HOST": "localhost",
+    "IMPORT_DIR": "test_dir",
+}
+
+dotenv.dotenv_values = lambda *args, **kwargs: dict(TEST_ENV)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import threading
+from contextlib import closing
+
+import pytest
+
+from importer.pipeline import iter_batches, threaded_batches
+
+
+class SourceState:
+    def __init__(self):
+        self.closed = threading.Event()
+        self.produced = 0
+
+def rows_source(state: SourceState, count: int):
+    try:
+        for i in range(count):
+            state.produced += 1
+            yield i
+    finally:
+        state.closed.set()
+
+def test_iter_batches():
+    assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+def test_threaded_batches_yields_all_rows():
+    state = SourceState()
+    source = rows_source(state, 10)
+    with closing(threaded_batches(source, 3)) as batches:
+        assert [row for batch in batches for row in batch] == list(range(10))
+    assert state.closed.is_set()
+
+def test_consumer_error_closes_source():
+    state = SourceState()
+    # Ссылка на источник держится до проверки: закрыть его должен конвейер, а не сборщик мусора.
+    source = rows_source(state, 1_000_000)
+    with pytest.raises(RuntimeError), closing(threaded_batches(source, 10)) as batches:
+        for _ in batches:
+            raise RuntimeError("ошибка загрузки")
+    assert state.closed.is_set()
+    assert state.produced < 1_000_000
+
+def test_producer_error_is_raised_to_consumer():
+    def failing():
+        yield 1
+        raise ValueError("ошибка разбора")
+
+    with pytest.raises(ValueError, match="ошибка разбора"), closing(threaded_batches(failing(), 10)) as batches:
+        list(batches)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from importer import xml_utils
+from importer.xml_utils import XmlReader, file_sha256
+
+
+XML = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<root><info_update date="2026-01-01T00:00:00"/><lines>'
+    '<line id_1c="a" it_ya="true"/><line id_1c="b" it_ya="false"/><line id_1c="c" it_ya="true"/>'
+    '</lines><delete>true</delete></root>'
+)
+
+
+@pytest.fixture
+def xml_path(tmp_path):
+    path = tmp_path / "prod_dop.xml"
+    path.write_text(XML, encoding="utf-8")
+    return path
+
+def read_in_thread(reader: XmlReader) -> tuple[list[str], int]:
+    """Проходит lines() в отдельном потоке, как конвейер threaded_batches."""
+    result = {}
+
+    def consume():
+        result["thread"] = threading.get_ident()
+        result["ids"] = [line.get("id_1c") for line in reader.lines()]
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    thread.join()
+    return result["ids"], result["thread"]
+
+def test_etree_reader_header_and_lines(xml_path):
+    reader = XmlReader(xml_path, backend="etree")
+    assert reader.header.info_update_date == "2026-01-01T00:00:00"
+    assert not reader.header.is_delete
+
+    ids, _ = read_in_thread(reader)
+    assert ids == ["a", "b", "c"]
+    assert reader.header.is_delete
+    assert reader.content_hash == file_sha256(xml_path)
+
+@pytest.mark.skipif(xml_utils.lxml_etree is None, reason="lxml не установлен")
+def test_lxml_iterparse_lives_on_iterating_thread(xml_path, monkeypatch):
+    created: list[int] = []
+    iterparse = xml_utils.lxml_etree.iterparse
+
+    def tracking_iterparse(*args, **kwargs):
+        created.append(threading.get_ident())
+        return iterparse(*args, **kwargs)
+
+    monkeypatch.setattr(xml_utils.lxml_etree, "iterparse", tracking_iterparse)
+
+    reader = XmlReader(xml_path, backend="lxml")
+    assert reader.header.info_update_date == "2026-01-01T00:00:00"
+    assert created == [threading.get_ident()]
+
+    ids, thread = read_in_thread(reader)
+    assert ids == ["a", "b", "c"]
+    assert created[1:] == [thread]
+    assert reader.header.is_delete
+    assert reader.content_hash == file_sha256(xml_path)